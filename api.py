@@ -1,126 +1,187 @@
+import codecs
+import gc
+import itertools
 import json
 import os
+import queue
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
+import bundle
+import dataflow
+import energy_store
 import engine
-
-
-def load_flows() -> dict:
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    path = os.path.join(base_dir, "flows.json")
-    if not os.path.exists(path):
-        return {}
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+import fused
+import metrics
+import result_cache
+import routing
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OPERATORS_DIR = os.path.join(BASE_DIR, "operators")
+REGISTRY = engine.get_registry(OPERATORS_DIR)
+# Opt-in: run named flows through generated per-flow functions (fused.py).
+FUSED_FLOWS = os.environ.get("FUSED_FLOWS", "").lower() in ("1", "true", "yes")
+# Routing rules for route_operators, compiled and key-indexed once at startup.
+ROUTING = routing.load_routing(os.path.join(BASE_DIR, "routing.json"))
+# Opt-in (RESULT_CACHE_MB): reuse operator-run results for repeated inputs.
+RESULT_CACHE = result_cache.cache_from_env()
+# GET /metrics (metrics.py); on unless METRICS=0.
+METRICS = None if os.environ.get("METRICS", "1").lower() in ("0", "false", "no") else metrics.Metrics()
+if METRICS is not None:
+    METRICS.counter("potential_http_requests_total", "HTTP requests by path and status code.", ("path", "status"))
+    METRICS.histogram("potential_http_request_duration_seconds", "HTTP request latency by path.", ("path",))
+    METRICS.histogram(
+        "potential_operator_duration_seconds", "Time to apply one operator's rules and gates.",
+        ("operator",), metrics.OPERATOR_BUCKETS
+    )
+    METRICS.counter(
+        "potential_rule_matches_total", "Matching rule index per operator run (none: no rule matched).",
+        ("operator", "rule")
+    )
+    METRICS.counter(
+        "potential_gate_triggers_total", "Triggered gates by operator, gate id and action.",
+        ("operator", "gate", "action")
+    )
+
+
+class FlowTable:
+    """
+    flows.json loaded once and checked against the operator registry.
+    `refresh()` reloads it when the file changes (checked at most every
+    `check_interval` seconds, or forced, e.g. on SIGHUP). A reload builds
+    the whole table and swaps it in, so in-flight requests keep the one they
+    started with. A file that fails to parse or names unknown operators is
+    rejected and the last good table stays in service.
+    """
+
+    def __init__(self, path: str, registry: engine.OperatorRegistry, check_interval: float = 1.0):
+        self.path = path
+        self.registry = registry
+        self.check_interval = check_interval
+        self.version = 0
+        self.flows: dict = {}
+        self.error = None
+        self._signature = None
+        self._last_check = None
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            flows = json.load(f)
+        if not isinstance(flows, dict):
+            raise ValueError("flows.json must be an object")
+        self.registry.refresh()
+        known = set(self.registry.ids())
+        for flow_id, sequence in flows.items():
+            if not isinstance(sequence, list) or not all(isinstance(op_id, str) for op_id in sequence):
+                raise ValueError(f"flow {flow_id}: must be a list of operator ids")
+            unknown = [op_id for op_id in sequence if op_id not in known]
+            if unknown:
+                raise ValueError(f"flow {flow_id}: unknown operators {unknown}")
+        return flows
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload flows.json if it changed. Returns True if a new table was
+        installed. The first load raises on a bad file; later ones keep the
+        previous table and record the problem in `error`.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self._last_check is not None
+            and now - self._last_check < self.check_interval
+        ):
+            return False
+        with self._lock:
+            self._last_check = now
+            signature = self._stat()
+            if not force and self.version and signature == self._signature:
+                return False
+            try:
+                flows = self._read()
+            except (OSError, ValueError) as exc:
+                if not self.version:
+                    raise
+                self.error = f"{type(exc).__name__}: {exc}"
+                print(f"flows.json reload rejected, keeping version {self.version}: {self.error}", file=sys.stderr)
+                self._signature = signature
+                return False
+            self.flows = flows
+            self._signature = signature
+            self.error = None
+            self.version += 1
+            return True
+
+    def seed(self, flows: dict, signature) -> None:
+        """
+        Install flows already validated elsewhere (a bundle) for the file
+        state `signature`, so refresh() only rereads it after a change.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            self.flows = flows
+            self._signature = signature
+            self.error = None
+            self.version += 1
+
+    def get(self, flow_id: str):
+        self.refresh()
+        return self.flows.get(flow_id)
+
+    def sequences(self) -> list:
+        self.refresh()
+        return list(self.flows.values())
+
+
+FLOWS = FlowTable(os.path.join(BASE_DIR, "flows.json"), REGISTRY)
+
+
+def run_sequence(case_id: str, inputs: dict, sequence: list, use_fused: bool = False, trace: bool = False) -> dict:
+    """
+    Run `sequence` on `inputs` (fused when asked), answering repeats from
+    RESULT_CACHE when it is enabled. Errors are never cached. A traced run
+    always goes through the engine and is never cached.
+    """
+    if trace:
+        return engine.run_inputs(case_id, inputs, sequence, OPERATORS_DIR, trace=True)
+    if RESULT_CACHE is None:
+        if use_fused:
+            return fused.run_fused(case_id, inputs, sequence, OPERATORS_DIR)
+        return engine.run_inputs(case_id, inputs, sequence, OPERATORS_DIR)
+
+    REGISTRY.refresh()
+    generation = (REGISTRY.content_hash, FLOWS.version)
+    RESULT_CACHE.check_generation(generation)
+    key = RESULT_CACHE.key_for(inputs, sequence)
+    cached = RESULT_CACHE.get(key)
+    if cached is not None:
+        return {"case_id": case_id, **cached}
+    if use_fused:
+        result = fused.run_fused(case_id, inputs, sequence, OPERATORS_DIR)
+    else:
+        result = engine.run_inputs(case_id, inputs, sequence, OPERATORS_DIR)
+    RESULT_CACHE.put(key, {k: v for k, v in result.items() if k != "case_id"}, generation)
+    return result
 
 
 def route_operators(inputs: dict, top_n: int) -> dict:
-    scores = {
-        "op.card01_state_standard": 0,
-        "op.card02_resulting_valence": 0,
-        "op.card03_controllability": 0,
-        "op.card04_multicausality": 0,
-        "op.card05_attribution": 0,
-        "op.card06_identity": 0,
-        "op.card07_laws_rules": 0,
-        "op.card08_action_outcome": 0,
-        "op.card08_1_capacity_phase": 0,
-        "op.card09_thresholds": 0,
-        "op.card10_transition_ambiguity": 0,
-        "op.card11_learning_staircase": 0,
-        "op.card12_abduction": 0,
-        "op.card13_leverage": 0,
-        "op.card14_pragmatic_idealism": 0,
-        "op.card15_mental_immune": 0,
-        "op.card16_mental_hygiene": 0,
-        "op.card17_self_responsibility": 0,
-        "op.card18_sufficiency": 0,
-        "op.card19_goal_pyramid": 0,
-        "op.card20_learning_pathways": 0
-        ,
-        "op.work_rule": 0,
-        "op.potential_temporal": 0,
-        "op.constraint_release": 0,
-        "op.velocity_definition": 0,
-        "op.homeostasis_clarification": 0
-    }
-
-    if inputs.get("state_is_verifiable") is False or inputs.get("standard_value") in (None, ""):
-        scores["op.card01_state_standard"] += 50
-    if inputs.get("procrastination_reported") is True or inputs.get("resulting_valence", 1) <= 0:
-        scores["op.card02_resulting_valence"] += 40
-    if inputs.get("controllability_scalar", 1) <= 0.3 or inputs.get("cites_external_factors") is True:
-        scores["op.card03_controllability"] += 40
-    if inputs.get("delegates_to_others") is True or inputs.get("user_causal_weight", 1) < 1:
-        scores["op.card04_multicausality"] += 30
-    if (
-        inputs.get("attribution_universal_helplessness") is True
-        or inputs.get("attribution_action_outcome_preserved") is False
-        or inputs.get("attribution_learnable_component") is False
-        or (
-            inputs.get("attribution_locus") in ("EXTERNAL", "INTERACTIONAL")
-            and inputs.get("attribution_conditionality_defined") is False
-        )
-    ):
-        scores["op.card05_attribution"] += 30
-    if inputs.get("attempts_identity_change") is True and inputs.get("successful_transitions_count", 0) < inputs.get("identity_update_threshold", 1):
-        scores["op.card06_identity"] += 25
-    if inputs.get("constraint_type") not in (None, "LAW", "RULE"):
-        scores["op.card07_laws_rules"] += 20
-    if inputs.get("aor_verified") is False:
-        scores["op.card08_action_outcome"] += 35
-    if (
-        inputs.get("action_defined") is False
-        or inputs.get("success_signal_defined") is False
-        or inputs.get("adaptation_defined") is False
-    ):
-        scores["op.card08_1_capacity_phase"] += 35
-    if inputs.get("effort_correct") is True and inputs.get("input_level", 0) <= inputs.get("threshold_value", 0):
-        scores["op.card09_thresholds"] += 30
-    if inputs.get("transition_phase") is True and inputs.get("confusion_reported") is True:
-        scores["op.card10_transition_ambiguity"] += 20
-    if inputs.get("learning_stage") == 2 and inputs.get("discomfort_reported") is True:
-        scores["op.card11_learning_staircase"] += 20
-    if inputs.get("demands_certainty") is True:
-        scores["op.card12_abduction"] += 25
-    if inputs.get("resulting_valence", 1) <= 0 and inputs.get("effort", 0) > 0:
-        scores["op.card13_leverage"] += 30
-    if inputs.get("ideal_changed") is True:
-        scores["op.card14_pragmatic_idealism"] += 25
-    if inputs.get("data_rejected") is True:
-        scores["op.card15_mental_immune"] += 30
-    if inputs.get("borrowed_standard_removed") is False:
-        scores["op.card16_mental_hygiene"] += 25
-    if inputs.get("guilt_framing") is True:
-        scores["op.card17_self_responsibility"] += 20
-    if inputs.get("necessary_claimed") is True and inputs.get("alternative_sufficiencies_count", 0) < 3:
-        scores["op.card18_sufficiency"] += 25
-    if inputs.get("behavior_stuck") is True and inputs.get("higher_layer_conflict") is True:
-        scores["op.card19_goal_pyramid"] += 30
-    if inputs.get("fear_reported") is True and inputs.get("evidence_interpreted_as_inability") is True:
-        scores["op.card20_learning_pathways"] += 20
-    if inputs.get("energy_expended") is True and inputs.get("displacement_observed") is False:
-        scores["op.work_rule"] += 30
-    if inputs.get("internal_kinetic_spent") is True and inputs.get("capacity_increased") is True:
-        scores["op.potential_temporal"] += 20
-    if inputs.get("constraints_lowered") is True and inputs.get("impulsive_action_observed") is True:
-        scores["op.constraint_release"] += 25
-    if inputs.get("goal_defined") is False and inputs.get("motion_coherent") is False:
-        scores["op.velocity_definition"] += 20
-    if inputs.get("short_term_imbalance_for_long_term_stability") is True:
-        scores["op.homeostasis_clarification"] += 15
-    if (
-        inputs.get("commitment_action_defined") is True
-        and inputs.get("commitment_timeframe_defined") is True
-    ):
-        scores["op.conclusion_detection"] = 30
-
-    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
-    top = [op for op, score in ranked if score > 0][:top_n]
-    if not top:
-        top = ["op.card01_state_standard", "op.card02_resulting_valence", "op.card03_controllability"]
-
-    return {"operators": top, "scores": scores}
+    return ROUTING.route(inputs, top_n)
 
 
 def recommend_phase(inputs: dict) -> str:
@@ -169,7 +230,7 @@ PHASE_SIGNAL_KEYS = [
 ]
 
 
-def _weighted_completeness(provided: set) -> dict:
+def _weighted_completeness(provided: set, with_keys: bool = True) -> dict:
     core = {
         "state_is_verifiable": 3,
         "standard_value": 3,
@@ -208,7 +269,7 @@ def _weighted_completeness(provided: set) -> dict:
     filled_weight += sum(weight for key, weight in supporting.items() if key in provided)
     if total_weight == 0:
         return {"score": 0, "filled_weight": 0, "total_weight": 0, "counted_keys": []}
-    counted_keys = [key for key in {**core, **supporting}.keys() if key in provided]
+    counted_keys = [key for key in {**core, **supporting}.keys() if key in provided] if with_keys else []
     score = int(round((filled_weight / total_weight) * 100))
     return {
         "score": score,
@@ -254,45 +315,55 @@ def _stability_from_energy(previous_energy: dict, current_energy: dict) -> int:
     return 10
 
 
-def phase_confidence(inputs: dict, provided: set, phase: str, current_energy: dict, previous_energy: dict) -> dict:
-    completeness = _weighted_completeness(provided)
+def phase_confidence(
+    inputs: dict,
+    provided: set,
+    phase: str,
+    current_energy: dict,
+    previous_energy: dict,
+    debug: bool = True
+) -> dict:
+    completeness = _weighted_completeness(provided, with_keys=debug)
     contradictions = _count_contradictions(inputs, provided)
     coherence = max(0, 100 - (contradictions * 25))
     stability = _stability_from_energy(previous_energy, current_energy)
 
     score = int(round(0.5 * completeness["score"] + 0.3 * stability + 0.2 * coherence))
-    return {
+    confidence = {
         "score": score,
         "reasons": {
             "completeness": completeness["score"],
             "coherence": coherence,
             "stability": stability,
             "contradictions": contradictions
+        }
+    }
+    if not debug:
+        return confidence
+    confidence["debug"] = {
+        "weights": {
+            "completeness": 0.5,
+            "stability": 0.3,
+            "coherence": 0.2
         },
-        "debug": {
-            "weights": {
-                "completeness": 0.5,
-                "stability": 0.3,
-                "coherence": 0.2
-            },
-            "inputs_provided_count": len(provided),
-            "inputs_provided_total": len(PHASE_SIGNAL_KEYS),
-            "weighted_filled": completeness["filled_weight"],
-            "weighted_total": completeness["total_weight"],
-            "weighted_counted_keys": completeness["counted_keys"],
-            "energy_delta": {
-                "potential": (
-                    None if not isinstance(previous_energy, dict) else current_energy.get("potential") - previous_energy.get("potential", 0)
-                ),
-                "utilization": (
-                    None if not isinstance(previous_energy, dict) else current_energy.get("utilization") - previous_energy.get("utilization", 0)
-                ),
-                "gap": (
-                    None if not isinstance(previous_energy, dict) else current_energy.get("gap") - previous_energy.get("gap", 0)
-                )
-            }
+        "inputs_provided_count": len(provided),
+        "inputs_provided_total": len(PHASE_SIGNAL_KEYS),
+        "weighted_filled": completeness["filled_weight"],
+        "weighted_total": completeness["total_weight"],
+        "weighted_counted_keys": completeness["counted_keys"],
+        "energy_delta": {
+            "potential": (
+                None if not isinstance(previous_energy, dict) else current_energy.get("potential") - previous_energy.get("potential", 0)
+            ),
+            "utilization": (
+                None if not isinstance(previous_energy, dict) else current_energy.get("utilization") - previous_energy.get("utilization", 0)
+            ),
+            "gap": (
+                None if not isinstance(previous_energy, dict) else current_energy.get("gap") - previous_energy.get("gap", 0)
+            )
         }
     }
+    return confidence
 
 
 def infer_capacity_phase(inputs: dict) -> str:
@@ -498,7 +569,8 @@ def missing_inputs_for(sequence: list, inputs: dict) -> dict:
     return missing
 
 
-_PREV_SCORES = {}
+# Last smoothed energy per case_id; bounded and evicting (energy_store.py).
+ENERGY_STORE = energy_store.store_from_env()
 
 
 def _provided_set(payload: dict, inputs: dict) -> set:
@@ -661,9 +733,9 @@ def compute_energy(inputs: dict, provided: set, gates_count: int, status: str) -
 def apply_ema(case_id: str, energy: dict) -> dict:
     if not case_id:
         return energy
-    prev = _PREV_SCORES.get(case_id)
+    prev = ENERGY_STORE.get(case_id)
     if not prev:
-        _PREV_SCORES[case_id] = energy
+        ENERGY_STORE.put(case_id, energy)
         return energy
     return apply_ema_with_prev(case_id, energy, prev)
 
@@ -674,10 +746,16 @@ def apply_ema_with_prev(case_id: str, energy: dict, prev: dict) -> dict:
         blended[key] = int(round(0.4 * energy[key] + 0.6 * prev.get(key, energy[key])))
     blended["ready_to_act"] = bool(blended["utilization"] >= 55 and blended["gap"] < 35)
     if case_id:
-        _PREV_SCORES[case_id] = blended
+        ENERGY_STORE.put(case_id, blended)
     return blended
 
 
+def remember_energy(case_id: str, energy: dict) -> None:
+    # The store keeps a copy, so record the final (post-penalty) energy too.
+    if case_id:
+        ENERGY_STORE.put(case_id, energy)
+
+
 def identify_fulcrums(inputs: dict, provided: set) -> list:
     candidates = []
 
@@ -777,208 +855,1022 @@ def identify_fulcrums(inputs: dict, provided: set) -> list:
     return candidates[:3]
 
 
-class Handler(BaseHTTPRequestHandler):
-    def _set_headers(self, status_code: int = 200):
-        self.send_response(status_code)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
-        self.end_headers()
+def _top_n(payload: dict) -> int:
+    top_n = payload.get("top_n", 3)
+    if not isinstance(top_n, int) or top_n <= 0:
+        top_n = 3
+    return top_n
 
-    def do_OPTIONS(self):
-        self._set_headers(204)
 
-    def do_HEAD(self):
-        if self.path in ("/", "/health"):
-            self._set_headers(200)
-            return
-        self._set_headers(404)
+VERBOSITY = ("full", "lean")
 
-    def do_GET(self):
-        if self.path in ("/", "/health"):
-            self._set_headers(200)
-            self.wfile.write(json.dumps({"status": "ok"}).encode("utf-8"))
-            return
-        self._set_headers(404)
-        self.wfile.write(json.dumps({"error": "not found"}).encode("utf-8"))
 
-    def do_POST(self):
-        if self.path not in ("/evaluate", "/route", "/route_and_evaluate", "/commitment_check", "/smooth_energy"):
-            self._set_headers(404)
-            self.wfile.write(json.dumps({"error": "not found"}).encode("utf-8"))
-            return
+def response_options(payload: dict) -> tuple:
+    """
+    (fields, lean, trace) from the optional `fields` (top-level response
+    keys to return; None means all), `verbosity` ("full" or "lean": no
+    route scores, phase_confidence debug or operators_ran) and `trace`
+    (add a "trace" object with rule-level steps and phase timings) keys.
+    """
+    fields = payload.get("fields")
+    if fields is not None and (not isinstance(fields, list) or not all(isinstance(key, str) for key in fields)):
+        raise ValueError("fields must be a list of response keys")
+    verbosity = payload.get("verbosity", "full")
+    if verbosity not in VERBOSITY:
+        raise ValueError("verbosity must be 'full' or 'lean'")
+    trace = payload.get("trace", False)
+    if not isinstance(trace, bool):
+        raise ValueError("trace must be true or false")
+    return (None if fields is None else set(fields)), verbosity == "lean", trace
 
-        length = int(self.headers.get("Content-Length", "0"))
-        raw = self.rfile.read(length).decode("utf-8")
-        try:
-            payload = json.loads(raw) if raw else {}
-        except json.JSONDecodeError:
-            self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "invalid json"}).encode("utf-8"))
-            return
 
-        inputs = payload.get("inputs") or {}
-        if not isinstance(inputs, dict):
-            self._set_headers(400)
-            self.wfile.write(json.dumps({"error": "inputs must be object"}).encode("utf-8"))
-            return
-        provided = _provided_set(payload, inputs)
+def _lap(phases: dict, name: str, started: float) -> float:
+    now = time.perf_counter()
+    phases[name] = round((now - started) * 1000, 3)
+    return now
 
-        if self.path == "/route":
-            top_n = payload.get("top_n", 3)
-            if not isinstance(top_n, int) or top_n <= 0:
-                top_n = 3
 
-            result = route_operators(inputs, top_n)
-            self._set_headers(200)
-            self.wfile.write(json.dumps(result).encode("utf-8"))
-            return
+def server_timing(body) -> str:
+    """
+    Server-Timing header value for a traced response body ("" otherwise).
+    """
+    trace = body.get("trace") if isinstance(body, dict) else None
+    if not isinstance(trace, dict):
+        return ""
+    return ", ".join(f"{name};dur={ms}" for name, ms in trace.get("phases_ms", {}).items())
 
-        if self.path == "/commitment_check":
-            sequence = ["op.commitment_check"]
-            case_id = payload.get("case_id", "commitment_case")
-            missing = missing_inputs_for(sequence, inputs)
-            if missing:
-                self._set_headers(200)
-                self.wfile.write(json.dumps({"status": "NEEDS_INPUTS", "missing_inputs": missing}).encode("utf-8"))
-                return
 
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            operators_dir = os.path.join(base_dir, "operators")
+def _select(body: dict, fields, lean: bool, heavy: tuple = ()) -> dict:
+    if fields is None and not lean:
+        return body
+    return {
+        key: value for key, value in body.items()
+        if (fields is None or key in fields) and not (lean and key in heavy)
+    }
+
+
+def handle_route(payload: dict, inputs: dict, provided: set) -> tuple:
+    try:
+        fields, lean, _ = response_options(payload)
+    except ValueError as exc:
+        return 400, {"error": str(exc)}
+    return 200, _select(route_operators(inputs, _top_n(payload)), fields, lean, ("scores",))
+
+
+def handle_commitment_check(payload: dict, inputs: dict, provided: set) -> tuple:
+    sequence = ["op.commitment_check"]
+    case_id = payload.get("case_id", "commitment_case")
+    missing = missing_inputs_for(sequence, inputs)
+    if missing:
+        return 200, {"status": "NEEDS_INPUTS", "missing_inputs": missing}
+
+    try:
+        result = engine.run_inputs(case_id, inputs, sequence, OPERATORS_DIR)
+    except Exception as exc:
+        return 400, {"error": str(exc)}
+
+    return 200, {"result": result}
+
+
+def handle_smooth_energy(payload: dict, inputs: dict, provided: set) -> tuple:
+    current = payload.get("current_energy")
+    previous = payload.get("previous_energy")
+    case_id = payload.get("case_id", "")
+    if not isinstance(current, dict) or not isinstance(previous, dict):
+        return 400, {"error": "current_energy and previous_energy must be objects"}
+    blended = apply_ema_with_prev(case_id, current, previous)
+    return 200, {"computed_energy": blended}
+
+
+def handle_route_and_evaluate(payload: dict, inputs: dict, provided: set) -> tuple:
+    try:
+        fields, lean, trace = response_options(payload)
+    except ValueError as exc:
+        return 400, {"error": str(exc)}
+
+    def want(key: str) -> bool:
+        return fields is None or key in fields
+
+    phases = {} if trace else None
+    mark = time.perf_counter() if trace else 0.0
+    routed = route_operators(inputs, _top_n(payload))
+    phase = recommend_phase(inputs) if want("phase_recommendation") else None
+    sequence = routed.get("operators", [])
+    case_id = payload.get("case_id", "api_case")
+    if trace:
+        mark = _lap(phases, "route", mark)
+
+    if not sequence:
+        return 400, {"error": "routing returned empty operator list"}
+
+    missing = missing_inputs_for(sequence, inputs)
+    result = None
+    operator_trace = []
+    if missing:
+        gates_count, status = 0, "NEEDS_INPUTS"
+    else:
+        try:
+            result = run_sequence(case_id, inputs, sequence, trace=trace)
+        except Exception as exc:
+            return 400, {"error": str(exc)}
+        if trace:
+            operator_trace = result.pop("trace")
+        gates_count, status = len(result.get("gates_triggered", [])), result.get("status")
+    if trace:
+        mark = _lap(phases, "engine", mark)
+
+    # Energy, EMA history and the contradiction penalty always run: they
+    # feed computed_energy and final_recommendation and update the store.
+    energy = compute_energy(inputs, provided, gates_count, status)
+    prev_energy = payload.get("previous_energy")
+    if isinstance(prev_energy, dict):
+        energy = apply_ema_with_prev(case_id, energy, prev_energy)
+    else:
+        energy = apply_ema(case_id, energy)
+    if trace:
+        mark = _lap(phases, "energy", mark)
+    confidence = phase_confidence(
+        inputs, provided, phase, energy, prev_energy,
+        debug=want("phase_confidence") and not lean
+    )
+    energy = apply_contradiction_penalty(energy, confidence["reasons"]["contradictions"])
+    remember_energy(case_id, energy)
+    if trace:
+        mark = _lap(phases, "confidence", mark)
+
+    body = {"status": "NEEDS_INPUTS"} if missing else {}
+    if want("route"):
+        body["route"] = {"operators": sequence} if lean else routed
+    if want("phase_recommendation"):
+        body["phase_recommendation"] = phase
+    if want("phase_confidence"):
+        body["phase_confidence"] = confidence
+    if missing and want("missing_inputs"):
+        body["missing_inputs"] = missing
+    if result is not None and want("result"):
+        body["result"] = _select(result, None, lean, ("operators_ran",))
+    if want("computed_energy"):
+        body["computed_energy"] = energy
+    if want("fulcrums"):
+        body["fulcrums"] = identify_fulcrums(inputs, provided)
+        if trace:
+            mark = _lap(phases, "fulcrums", mark)
+    if want("capacity_phase") or want("final_recommendation"):
+        if result is None:
+            capacity_phase = infer_capacity_phase(inputs)
+        else:
+            capacity_phase = capacity_phase_from_result(result) or infer_capacity_phase(inputs)
+        if want("capacity_phase"):
+            body["capacity_phase"] = capacity_phase
+        if want("final_recommendation"):
+            body["final_recommendation"] = reconcile_final_recommendation(capacity_phase, energy["ready_to_act"])
+    if trace:
+        body["trace"] = {"phases_ms": phases, "operators": operator_trace}
+    return 200, body
+
+
+def handle_evaluate(payload: dict, inputs: dict, provided: set) -> tuple:
+    try:
+        fields, lean, trace = response_options(payload)
+    except ValueError as exc:
+        return 400, {"error": str(exc)}
+
+    sequence = payload.get("operator_sequence")
+    flow_id = payload.get("flow_id")
+    case_id = payload.get("case_id", "api_case")
+
+    use_fused = False
+    if not sequence and flow_id:
+        sequence = FLOWS.get(flow_id)
+        use_fused = FUSED_FLOWS
+
+    if not isinstance(sequence, list) or not sequence:
+        return 400, {"error": "inputs must be object and operator_sequence must be non-empty list"}
+
+    # Optional: only the state keys the caller needs; skips operators they
+    # do not depend on (dataflow.py).
+    outputs = payload.get("outputs")
+    if outputs is not None and (
+        not isinstance(outputs, list) or not outputs or not all(isinstance(key, str) for key in outputs)
+    ):
+        return 400, {"error": "outputs must be a non-empty list of state keys"}
+
+    # Optional: resubmission of an earlier result with the changed input keys;
+    # only operators from the first one that reads a changed key rerun.
+    previous = payload.get("previous_result")
+    changed_keys = payload.get("changed_keys")
+    if previous is not None and (
+        not isinstance(previous, dict)
+        or not isinstance(changed_keys, list)
+        or not all(isinstance(key, str) for key in changed_keys)
+    ):
+        return 400, {"error": "previous_result must be object and changed_keys a list of input keys"}
+    if trace and (outputs is not None or previous is not None):
+        return 400, {"error": "trace runs the full sequence; it cannot be combined with outputs or previous_result"}
+
+    started = time.perf_counter() if trace else 0.0
+    try:
+        if outputs is not None:
+            result = dataflow.run_planned(case_id, inputs, sequence, outputs, OPERATORS_DIR)
+        elif previous is not None:
+            result = dataflow.run_incremental(case_id, inputs, sequence, previous, changed_keys, OPERATORS_DIR)
+        else:
+            result = run_sequence(case_id, inputs, sequence, use_fused, trace)
+    except Exception as exc:
+        return 400, {"error": str(exc)}
+
+    if trace:
+        phases = {}
+        _lap(phases, "engine", started)
+        operator_trace = result.pop("trace")
+        body = _select(result, fields, lean, ("operators_ran",))
+        body["trace"] = {"phases_ms": phases, "operators": operator_trace}
+        return 200, body
+    return 200, _select(result, fields, lean, ("operators_ran",))
+
+
+ENDPOINTS = {
+    "/evaluate": handle_evaluate,
+    "/route": handle_route,
+    "/route_and_evaluate": handle_route_and_evaluate,
+    "/commitment_check": handle_commitment_check,
+    "/smooth_energy": handle_smooth_energy
+}
+
+# Batch variants take a JSON array of the payloads the single endpoint takes
+# (or an NDJSON body, Content-Type application/x-ndjson) of the payloads the
+# single endpoint takes and stream one NDJSON line per item, in order, as
+# each one finishes. Items are decoded from the socket one at a time, so
+# memory is bounded by the largest item (Handler.max_body), not the batch.
+BATCH_ENDPOINTS = {
+    "/evaluate_batch": "/evaluate",
+    "/route_and_evaluate_batch": "/route_and_evaluate"
+}
+
+POST_PATHS = tuple(ENDPOINTS) + tuple(BATCH_ENDPOINTS)
+GET_PATHS = ("/", "/health", "/stats", "/metrics")
+
+
+def _observe_operator(op_id: str, seconds: float, matched, gates: list) -> None:
+    METRICS.observe("potential_operator_duration_seconds", (op_id,), seconds)
+    METRICS.inc("potential_rule_matches_total", (op_id, "none" if matched is None else str(matched)))
+    for gate in gates:
+        METRICS.inc("potential_gate_triggers_total", (op_id, gate["id"], gate["action"]))
+
+
+def _record_request(path: str, status: int, started: float) -> None:
+    METRICS.inc("potential_http_requests_total", (path, status))
+    METRICS.observe("potential_http_request_duration_seconds", (path,), time.perf_counter() - started)
+
+
+def metrics_text() -> str:
+    """
+    Exposition of METRICS plus store gauges read at scrape time.
+    """
+    gauges = []
+
+    def add(name: str, kind: str, help_text: str, value, labels: dict = None) -> None:
+        labels = labels or {}
+        gauges.append((name, kind, help_text, tuple(labels), [(tuple(labels.values()), value)]))
+
+    store = ENERGY_STORE.stats()
+    backend = {"backend": store["backend"]}
+    add("potential_energy_store_entries", "gauge", "Case ids in the EMA energy store.", store["size"], backend)
+    add("potential_energy_store_max_entries", "gauge", "EMA energy store size bound.", store["max_entries"], backend)
+    if "pending" in store:
+        add("potential_energy_store_pending", "gauge", "EMA entries not yet flushed to SQLite.", store["pending"], backend)
+    for key in ("hits", "misses", "evictions", "expirations"):
+        add(f"potential_energy_store_{key}_total", "counter", f"EMA energy store {key}.", store[key], backend)
+    exprs = engine.expr_cache_stats()
+    add("potential_expr_cache_entries", "gauge", "Compiled rule expressions cached.", exprs["size"])
+    for key in ("hits", "misses", "evictions"):
+        add(f"potential_expr_cache_{key}_total", "counter", f"Expression cache {key}.", exprs[key])
+    if RESULT_CACHE is not None:
+        cache = RESULT_CACHE.stats()
+        add("potential_result_cache_entries", "gauge", "Cached operator-run results.", cache["entries"])
+        add("potential_result_cache_bytes", "gauge", "Estimated size of cached results.", cache["bytes"])
+        for key in ("hits", "misses", "evictions", "invalidations"):
+            add(f"potential_result_cache_{key}_total", "counter", f"Result cache {key}.", cache[key])
+    return METRICS.render(gauges)
+
+
+def dispatch(path: str, payload: dict) -> tuple:
+    """
+    Run one POST payload through the endpoint at `path`; returns
+    (status_code, response_body).
+    """
+    inputs = payload.get("inputs") or {}
+    if not isinstance(inputs, dict):
+        return 400, {"error": "inputs must be object"}
+    provided = _provided_set(payload, inputs)
+    return ENDPOINTS[path](payload, inputs, provided)
+
+
+_END = object()
+
+
+def iter_json_array(chunks, max_item: int):
+    """
+    Yield the elements of a JSON array arriving as byte `chunks`, each as
+    soon as it is complete. Raises ValueError for malformed input, or
+    BodyError(413) when one element exceeds `max_item` bytes.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    done = False
+
+    def more() -> bool:
+        # Append the next chunk; False once the body is exhausted.
+        nonlocal buf, pos, done
+        if done:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            done = True
+            buf = buf[pos:] + utf8.decode(b"", final=True)
+        else:
+            buf = buf[pos:] + utf8.decode(chunk)
+        pos = 0
+        return True
+
+    def skip_ws() -> bool:
+        # Advance to the next non-whitespace character; False at the end.
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return True
+            if not more():
+                return False
+
+    if not skip_ws() or buf[pos] != "[":
+        raise ValueError("batch payload must be array")
+    pos += 1
+    if not skip_ws():
+        raise ValueError("invalid json")
+    if buf[pos] == "]":
+        pos += 1
+    else:
+        while True:
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # Incomplete so far; the buffer beyond pos is this item.
+                    if len(buf) - pos > max_item:
+                        raise BodyError(413, f"batch item exceeds {max_item} bytes")
+                    if more():
+                        continue
+                    raise ValueError("invalid json")
+                # A number cut by a chunk boundary ("2." + "5") decodes
+                # early: accept only once what follows can end an element.
+                if done or (end < len(buf) and buf[end] in " \t\r\n,]"):
+                    break
+                more()
+            pos = end
+            if not skip_ws():
+                raise ValueError("invalid json")
+            separator = buf[pos]
+            pos += 1
+            yield item
+            if separator == "]":
+                break
+            if separator != "," or not skip_ws():
+                raise ValueError("invalid json")
+    if skip_ws():
+        raise ValueError("invalid json")
+
+
+def iter_ndjson(chunks, max_item: int):
+    """
+    Yield one decoded value per non-blank line of an NDJSON body.
+    """
+    buf = b""
+    for chunk in chunks:
+        buf += chunk
+        lines = buf.split(b"\n")
+        buf = lines.pop()
+        if len(buf) > max_item:
+            raise BodyError(413, f"batch item exceeds {max_item} bytes")
+        for line in lines:
+            if line.strip():
+                yield _json_line(line)
+    if buf.strip():
+        yield _json_line(buf)
+
+
+def _json_line(line: bytes):
+    try:
+        return json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError("invalid json")
+
+
+def iter_batch(path: str, payloads: list):
+    """
+    Yield one {"index", "status", "body"} record per payload. A failing item
+    gets its own error record; it never aborts the rest of the batch.
+    """
+    for index, payload in enumerate(payloads):
+        if not isinstance(payload, dict):
+            status, body = 400, {"error": "payload must be object"}
+        else:
             try:
-                result = engine.run_inputs(case_id, inputs, sequence, operators_dir)
+                status, body = dispatch(path, payload)
             except Exception as exc:
-                self._set_headers(400)
-                self.wfile.write(json.dumps({"error": str(exc)}).encode("utf-8"))
-                return
+                status, body = 500, {"error": f"{type(exc).__name__}: {exc}"}
+        yield {"index": index, "status": status, "body": body}
 
-            self._set_headers(200)
-            self.wfile.write(json.dumps({"result": result}).encode("utf-8"))
-            return
 
-        if self.path == "/smooth_energy":
-            current = payload.get("current_energy")
-            previous = payload.get("previous_energy")
-            case_id = payload.get("case_id", "")
-            if not isinstance(current, dict) or not isinstance(previous, dict):
-                self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "current_energy and previous_energy must be objects"}).encode("utf-8"))
-                return
-            blended = apply_ema_with_prev(case_id, current, previous)
-            self._set_headers(200)
-            self.wfile.write(json.dumps({"computed_energy": blended}).encode("utf-8"))
-            return
+class BodyError(Exception):
+    """
+    Request body that cannot be read; answered with `status`.
+    """
 
-        if self.path == "/route_and_evaluate":
-            top_n = payload.get("top_n", 3)
-            if not isinstance(top_n, int) or top_n <= 0:
-                top_n = 3
-            routed = route_operators(inputs, top_n)
-            phase = recommend_phase(inputs)
-            sequence = routed.get("operators", [])
-            case_id = payload.get("case_id", "api_case")
-
-            if not sequence:
-                self._set_headers(400)
-                self.wfile.write(json.dumps({"error": "routing returned empty operator list"}).encode("utf-8"))
-                return
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
 
-            missing = missing_inputs_for(sequence, inputs)
-            if missing:
-                energy = compute_energy(inputs, provided, 0, "NEEDS_INPUTS")
-                prev_energy = payload.get("previous_energy")
-                if isinstance(prev_energy, dict):
-                    energy = apply_ema_with_prev(case_id, energy, prev_energy)
-                else:
-                    energy = apply_ema(case_id, energy)
-                confidence = phase_confidence(inputs, provided, phase, energy, prev_energy)
-                energy = apply_contradiction_penalty(energy, confidence["reasons"]["contradictions"])
-                fulcrums = identify_fulcrums(inputs, provided)
-                capacity_phase = infer_capacity_phase(inputs)
-                final_recommendation = reconcile_final_recommendation(capacity_phase, energy["ready_to_act"])
-                self._set_headers(200)
-                self.wfile.write(json.dumps({
-                    "status": "NEEDS_INPUTS",
-                    "route": routed,
-                    "phase_recommendation": phase,
-                    "phase_confidence": confidence,
-                    "missing_inputs": missing,
-                    "computed_energy": energy,
-                    "fulcrums": fulcrums,
-                    "capacity_phase": capacity_phase,
-                    "final_recommendation": final_recommendation
-                }).encode("utf-8"))
-                return
 
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            operators_dir = os.path.join(base_dir, "operators")
-            try:
-                result = engine.run_inputs(case_id, inputs, sequence, operators_dir)
-            except Exception as exc:
-                self._set_headers(400)
-                self.wfile.write(json.dumps({"error": str(exc)}).encode("utf-8"))
+class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keep-alive: every response carries its framing, and idle
+    # connections are dropped after KEEPALIVE_TIMEOUT seconds. Under
+    # PooledHTTPServer an idle connection waits in the server's selector,
+    # not in a worker thread.
+    protocol_version = "HTTP/1.1"
+    timeout = float(os.environ.get("KEEPALIVE_TIMEOUT", "5"))
+    # Whole-body deadline, so a slow upload cannot hold a worker for long.
+    body_timeout = float(os.environ.get("BODY_TIMEOUT", "10"))
+    # Bodies are read into memory whole; larger ones get 413.
+    max_body = int(os.environ.get("MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+
+    def handle(self):
+        park = getattr(self.server, "park", None)
+        if park is None:
+            super().handle()
+            return
+        # Serve requests while input is already waiting (pipelined or
+        # back-to-back), then hand the idle connection back to the server.
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if not self._input_waiting():
+                self.wfile.flush()
+                # Not parked while the server drains; the worker closes it.
+                self.parked = park(self.request, self.client_address)
                 return
+            self.handle_one_request()
 
-            gates_count = len(result.get("gates_triggered", []))
-            energy = compute_energy(inputs, provided, gates_count, result.get("status"))
-            prev_energy = payload.get("previous_energy")
-            if isinstance(prev_energy, dict):
-                energy = apply_ema_with_prev(case_id, energy, prev_energy)
+    def _input_waiting(self) -> bool:
+        # Buffered or readable right now; never blocks.
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def _set_headers(self, status_code: int = 200, length: int = 0, content_type: str = "application/json", timing: str = ""):
+        self.send_response(status_code)
+        self.send_header("Content-Type", content_type)
+        if timing:
+            self.send_header("Server-Timing", timing)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        if getattr(self.server, "draining", False):
+            # Last response on this connection (also sets close_connection).
+            self.send_header("Connection", "close")
+        if length is None:
+            # Streamed body: chunked on HTTP/1.1, close-delimited on 1.0.
+            if self.request_version == "HTTP/1.1":
+                self.send_header("Transfer-Encoding", "chunked")
             else:
-                energy = apply_ema(case_id, energy)
-            confidence = phase_confidence(inputs, provided, phase, energy, prev_energy)
-            energy = apply_contradiction_penalty(energy, confidence["reasons"]["contradictions"])
-            fulcrums = identify_fulcrums(inputs, provided)
-            capacity_phase = capacity_phase_from_result(result) or infer_capacity_phase(inputs)
-            final_recommendation = reconcile_final_recommendation(capacity_phase, energy["ready_to_act"])
-            self._set_headers(200)
-            self.wfile.write(json.dumps({
-                "route": routed,
-                "phase_recommendation": phase,
-                "phase_confidence": confidence,
-                "result": result,
-                "computed_energy": energy,
-                "fulcrums": fulcrums,
-                "capacity_phase": capacity_phase,
-                "final_recommendation": final_recommendation
-            }).encode("utf-8"))
-            return
+                self.close_connection = True
+        elif status_code != 204:
+            # 204 has no body by definition and must not send Content-Length.
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
 
-        sequence = payload.get("operator_sequence")
-        flow_id = payload.get("flow_id")
-        case_id = payload.get("case_id", "api_case")
+    def _send_json(self, status_code: int, payload, head_only: bool = False, timing: str = "") -> int:
+        body = json.dumps(payload).encode("utf-8")
+        self._set_headers(status_code, len(body), timing=timing)
+        if not head_only:
+            self.wfile.write(body)
+        return status_code
+
+    def _stream_ndjson(self, records):
+        self._set_headers(200, None, "application/x-ndjson")
+        chunked = self.request_version == "HTTP/1.1"
+        for record in records:
+            line = json.dumps(record).encode("utf-8") + b"\n"
+            if chunked:
+                line = b"%x\r\n%s\r\n" % (len(line), line)
+            self.wfile.write(line)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
 
-        flows = load_flows()
-        if not sequence and flow_id:
-            sequence = flows.get(flow_id)
+    def do_OPTIONS(self):
+        self._set_headers(204)
 
-        if not isinstance(sequence, list) or not sequence:
-            self._set_headers(400)
-            self.wfile.write(
-                json.dumps({"error": "inputs must be object and operator_sequence must be non-empty list"}).encode("utf-8")
-            )
-            return
+    def do_HEAD(self):
+        self.do_GET(head_only=True)
 
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        operators_dir = os.path.join(base_dir, "operators")
+    def do_GET(self, head_only: bool = False):
+        started = time.perf_counter()
+        # An exception escaping the handler is counted as a 500.
+        status = 500
+        try:
+            status = self._get(head_only)
+        finally:
+            if METRICS is not None:
+                _record_request(self.path if self.path in GET_PATHS else "other", status, started)
 
+    def _get(self, head_only: bool) -> int:
+        if self.path in ("/", "/health"):
+            return self._send_json(200, {"status": "ok"}, head_only)
+        if self.path == "/stats":
+            stats = {
+                "energy_store": ENERGY_STORE.stats(),
+                "expr_cache": engine.expr_cache_stats(),
+                "flows": {"version": FLOWS.version, "count": len(FLOWS.flows), "error": FLOWS.error}
+            }
+            if RESULT_CACHE is not None:
+                stats["result_cache"] = RESULT_CACHE.stats()
+            return self._send_json(200, stats, head_only)
+        if self.path == "/metrics" and METRICS is not None:
+            body = metrics_text().encode("utf-8")
+            self._set_headers(200, len(body), "text/plain; version=0.0.4; charset=utf-8")
+            if not head_only:
+                self.wfile.write(body)
+            return 200
+        return self._send_json(404, {"error": "not found"}, head_only)
+
+    def _content_length(self) -> int:
         try:
-            result = engine.run_inputs(case_id, inputs, sequence, operators_dir)
-        except Exception as exc:
-            self._set_headers(400)
-            self.wfile.write(json.dumps({"error": str(exc)}).encode("utf-8"))
-            return
+            length = int(self.headers.get("Content-Length", "0"))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            raise BodyError(400, "invalid Content-Length")
+        return length
+
+    def _body_chunks(self, length: int):
+        """
+        Yield the body's bytes as they arrive. At most `body_timeout`
+        seconds in total may be spent waiting for them (time spent by the
+        consumer between chunks does not count). Raises BodyError, after
+        which the connection is closed since its position in the stream
+        is unknown.
+        """
+        remaining = length
+        budget = self.body_timeout
+        try:
+            while remaining:
+                if budget <= 0:
+                    raise socket.timeout()
+                self.connection.settimeout(budget)
+                started = time.monotonic()
+                chunk = self.rfile.read1(min(remaining, 65536))
+                budget -= time.monotonic() - started
+                if not chunk:
+                    self.close_connection = True
+                    raise BodyError(400, "incomplete body")
+                remaining -= len(chunk)
+                self.connection.settimeout(self.timeout)
+                yield chunk
+        except socket.timeout:
+            self.close_connection = True
+            raise BodyError(408, "request body timed out")
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def _read_body(self) -> bytes:
+        """
+        The whole request body, at most `max_body` bytes (413 beyond).
+        """
+        length = self._content_length()
+        if length > self.max_body:
+            # Not read, so the rest of the stream is unusable.
+            self.close_connection = True
+            raise BodyError(413, f"body exceeds {self.max_body} bytes")
+        return b"".join(self._body_chunks(length))
+
+    def do_POST(self):
+        started = time.perf_counter()
+        status = 500
+        try:
+            status = self._post()
+        finally:
+            if METRICS is not None:
+                _record_request(self.path if self.path in POST_PATHS else "other", status, started)
+
+    def _post(self) -> int:
+        if self.path in BATCH_ENDPOINTS:
+            return self._post_batch()
+        # Always consume the body so the next request on a kept-alive
+        # connection starts at the right place.
+        try:
+            body = self._read_body()
+        except BodyError as exc:
+            return self._send_json(exc.status, {"error": str(exc)})
+
+        if self.path not in POST_PATHS:
+            return self._send_json(404, {"error": "not found"})
+
+        try:
+            raw = body.decode("utf-8")
+            payload = json.loads(raw) if raw else {}
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return self._send_json(400, {"error": "invalid json"})
+
+        if not isinstance(payload, dict):
+            return self._send_json(400, {"error": "payload must be object"})
+
+        status, response = dispatch(self.path, payload)
+        return self._send_json(status, response, timing=server_timing(response))
+
 
-        self._set_headers(200)
-        self.wfile.write(json.dumps(result).encode("utf-8"))
+    def _post_batch(self) -> int:
+        """
+        Stream a batch while its body is still arriving. Problems found
+        before the first item are answered with a plain error status; later
+        ones (the response is already 200) end the stream with an error
+        record and close the connection.
+        """
+        try:
+            chunks = self._body_chunks(self._content_length())
+            if self.headers.get("Content-Type", "").split(";")[0].strip() in ("application/x-ndjson", "application/jsonl"):
+                items = iter_ndjson(chunks, self.max_body)
+            else:
+                items = iter_json_array(chunks, self.max_body)
+            first = next(items, _END)
+        except BodyError as exc:
+            self.close_connection = True
+            return self._send_json(exc.status, {"error": str(exc)})
+        except ValueError as exc:
+            # Read past the rest of a small body so the connection can be
+            # kept; anything larger is dropped with it.
+            budget = self.max_body
+            try:
+                for chunk in chunks:
+                    budget -= len(chunk)
+                    if budget < 0:
+                        self.close_connection = True
+                        break
+            except BodyError:
+                pass
+            chunks.close()
+            return self._send_json(400, {"error": str(exc)})
+        payloads = iter(()) if first is _END else itertools.chain((first,), items)
+
+        def records():
+            index = 0
+            try:
+                for record in iter_batch(BATCH_ENDPOINTS[self.path], payloads):
+                    index += 1
+                    yield record
+            except (BodyError, ValueError) as exc:
+                self.close_connection = True
+                yield {"index": index, "status": getattr(exc, "status", 400), "body": {"error": str(exc)}}
+
+        self._stream_ndjson(records())
+        return 200
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer that hands connections to a fixed pool of worker threads
+    through a bounded queue. A connection is queued only once it has
+    request bytes to read: new and idle keep-alive connections wait in a
+    selector watched by one thread, and are closed after Handler.timeout
+    seconds without input. When the queue is full the connection is
+    answered with 503 instead of stalling.
+    """
+
+    def __init__(self, server_address, handler_class, workers: int = 8, queue_depth: int = 64, bind_and_activate: bool = True):
+        self.request_queue_size = max(queue_depth, 5)
+        super().__init__(server_address, handler_class, bind_and_activate)
+        self._pending: "queue.Queue" = queue.Queue(maxsize=queue_depth)
+        # (request, client_address) handed to the selector thread
+        self._to_park: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._wake_r, self._wake_w = socket.socketpair()
+        # Set by server_close(); responses then carry Connection: close.
+        self.draining = False
+        self._park_lock = threading.Lock()
+        self._selector_thread = threading.Thread(target=self._watch_idle, name="api-idle", daemon=True)
+        self._selector_thread.start()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"api-worker-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._workers:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        if not self.park(request, client_address):
+            self._reject(request)
+
+    def park(self, request, client_address) -> bool:
+        """
+        Watch `request` until it has input (new connections, and kept-alive
+        ones from Handler). False while draining: nothing is parked then.
+        """
+        with self._park_lock:
+            if self.draining:
+                return False
+            self._to_park.put((request, client_address))
+        self._wake()
+        return True
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _watch_idle(self):
+        idle = selectors.DefaultSelector()
+        idle.register(self._wake_r, selectors.EVENT_READ)
+        # request -> (client_address, deadline)
+        waiting = {}
+        while True:
+            with self._park_lock:
+                draining = self.draining
+                while True:
+                    try:
+                        request, client_address = self._to_park.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        idle.register(request, selectors.EVENT_READ)
+                    except (OSError, ValueError):
+                        # closed by the client in the meantime
+                        self.shutdown_request(request)
+                        continue
+                    waiting[request] = (client_address, time.monotonic() + Handler.timeout)
+            if draining:
+                break
+            now = time.monotonic()
+            for request, (client_address, deadline) in list(waiting.items()):
+                if deadline <= now:
+                    idle.unregister(request)
+                    del waiting[request]
+                    self.shutdown_request(request)
+            wait = min((deadline for _, deadline in waiting.values()), default=now + 1) - now
+            for key, _ in idle.select(max(wait, 0)):
+                if key.fileobj is self._wake_r:
+                    try:
+                        self._wake_r.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                request = key.fileobj
+                idle.unregister(request)
+                client_address, _ = waiting.pop(request)
+                try:
+                    self._pending.put_nowait((request, client_address))
+                except queue.Full:
+                    self._reject(request)
+        # Draining: connections whose request has already arrived are still
+        # served (the workers run until the queue is empty); idle ones are
+        # closed, which a keep-alive client treats as a normal close.
+        for key, _ in idle.select(0):
+            request = key.fileobj
+            if request is not self._wake_r:
+                client_address, _ = waiting.pop(request)
+                self._pending.put((request, client_address))
+        for request in waiting:
+            self.shutdown_request(request)
+        idle.close()
+
+    def _reject(self, request):
+        body = json.dumps({"error": "server busy"}).encode("utf-8")
+        head = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Retry-After: 1\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+        try:
+            request.sendall(head + body)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            parked = False
+            try:
+                handler = self.RequestHandlerClass(request, client_address, self)
+                parked = getattr(handler, "parked", False)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                if not parked:
+                    self.shutdown_request(request)
+
+    def server_close(self):
+        """
+        Drain: stop parking, queue connections that already sent a request
+        and close idle ones, then let the workers finish everything queued
+        before they exit.
+        """
+        super().server_close()
+        with self._park_lock:
+            self.draining = True
+        self._wake()
+        self._selector_thread.join()
+        for _ in self._workers:
+            self._pending.put(None)
+        for thread in self._workers:
+            thread.join(timeout=Handler.timeout + 1)
+        self._wake_r.close()
+        self._wake_w.close()
+
+
+def server_settings() -> dict:
+    return {
+        "port": int(os.environ.get("PORT", "8000")),
+        "workers": int(os.environ.get("WORKER_THREADS", "8")),
+        "queue_depth": int(os.environ.get("QUEUE_DEPTH", "64")),
+        "processes": int(os.environ.get("PREFORK_WORKERS", "0")),
+        "drain_timeout": float(os.environ.get("DRAIN_TIMEOUT", "30"))
+    }
+
+
+def warm_up():
+    if not REGISTRY.version:
+        # operators.bundle, when fresh, replaces parsing and compiling the
+        # sources; the refreshes below then only confirm nothing changed.
+        loaded = bundle.load_into(REGISTRY, FLOWS.path)
+        if loaded is not None:
+            FLOWS.seed(loaded["flows"], loaded["signatures"].get("flows.json"))
+            # stderr: warm_up also runs in gen_cases.py and bench, whose
+            # stdout is JSON.
+            print(f"Loaded operator bundle ({bundle.describe(loaded)})", file=sys.stderr)
+    REGISTRY.refresh(force=True)
+    FLOWS.refresh(force=not FLOWS.version)
+    if FUSED_FLOWS:
+        for sequence in FLOWS.sequences():
+            fused.get_fused(sequence, OPERATORS_DIR)
+
+
+def _reload_flows_on_sighup() -> None:
+    # Reload off the signal handler so it never waits on a lock the
+    # interrupted code might hold.
+    def on_hup(signum, frame):
+        threading.Thread(target=FLOWS.refresh, kwargs={"force": True}, daemon=True).start()
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, on_hup)
+
+
+def _serve_child(listener: socket.socket, settings: dict) -> int:
+    """
+    Worker process body: serve on the inherited listening socket until
+    SIGTERM, then finish queued and in-flight connections and exit.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _reload_flows_on_sighup()
+    server = PooledHTTPServer(
+        listener.getsockname(),
+        Handler,
+        workers=settings["workers"],
+        queue_depth=settings["queue_depth"],
+        bind_and_activate=False
+    )
+    server.socket.close()
+    server.socket = listener
+
+    def on_term(signum, frame):
+        # shutdown() blocks until serve_forever returns, so call it off-thread.
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, on_term)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        ENERGY_STORE.close()
+    return 0
+
+
+def serve_prefork(settings: dict) -> None:
+    """
+    Pre-fork supervisor: bind once, load operators (and fused flows) before
+    forking so children share them copy-on-write, keep `processes` children
+    accepting on the inherited socket, restart any that die, and on SIGTERM
+    or SIGINT drain them for up to `drain_timeout` seconds.
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(("0.0.0.0", settings["port"]))
+    listener.listen(max(settings["queue_depth"], 5) * settings["processes"])
+
+    warm_up()
+    gc.freeze()
+
+    children = set()
+    stopping = []
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _serve_child(listener, settings)
+            finally:
+                os._exit(code)
+        children.add(pid)
+
+    def on_stop(signum, frame):
+        if not stopping:
+            stopping.append(time.monotonic() + settings["drain_timeout"])
+            for pid in list(children):
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def on_hup(signum, frame):
+        # Children reload their own copy; later forks see the file anyway.
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGHUP, on_hup)
+
+    for _ in range(settings["processes"]):
+        spawn()
+    print(
+        f"Listening on http://0.0.0.0:{settings['port']} "
+        f"(processes={settings['processes']}, workers={settings['workers']}, queue_depth={settings['queue_depth']})"
+    )
+
+    recent_restarts = []
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if stopping and time.monotonic() > stopping[0]:
+                for child in list(children):
+                    try:
+                        os.kill(child, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            time.sleep(0.2)
+            continue
+        children.discard(pid)
+        if stopping:
+            continue
+        print(f"worker {pid} exited with status {status}; restarting")
+        now = time.monotonic()
+        recent_restarts = [t for t in recent_restarts if now - t < 10] + [now]
+        if len(recent_restarts) > settings["processes"] * 3:
+            # crash loop: back off instead of forking as fast as we can
+            time.sleep(1)
+        spawn()
+    listener.close()
 
 
 def main():
-    port = int(os.environ.get("PORT", "8000"))
-    server = HTTPServer(("0.0.0.0", port), Handler)
-    print(f"Listening on http://0.0.0.0:{port}")
-    server.serve_forever()
+    settings = server_settings()
+    if METRICS is not None:
+        engine.OPERATOR_OBSERVER = _observe_operator
+    if settings["processes"] > 0 and hasattr(os, "fork"):
+        serve_prefork(settings)
+        return
+    warm_up()
+    _reload_flows_on_sighup()
+    server = PooledHTTPServer(
+        ("0.0.0.0", settings["port"]),
+        Handler,
+        workers=settings["workers"],
+        queue_depth=settings["queue_depth"]
+    )
+    print(
+        f"Listening on http://0.0.0.0:{settings['port']} "
+        f"(workers={settings['workers']}, queue_depth={settings['queue_depth']})"
+    )
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        ENERGY_STORE.close()
 
 
 if __name__ == "__main__":
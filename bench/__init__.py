@@ -0,0 +1,5 @@
+"""
+In-process micro-benchmarks for the engine and API scoring hot paths.
+
+Run from the repository root: python3 -m bench --help
+"""
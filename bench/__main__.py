@@ -0,0 +1,106 @@
+"""
+python3 -m bench [options]
+
+Times every benchmark in bench/suite.py, prints ops/sec and per-call
+percentiles, and compares p50 against a saved baseline. Exits 1 when any
+benchmark's p50 is slower than the baseline by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import api
+
+from bench import suite
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python3 -m bench", description="Micro-benchmarks for engine and scoring hot paths.")
+    parser.add_argument("--cases", default=suite.CASES_DIR,
+                        help="directory of *.json cases or a JSONL file of cases (default: cases/)")
+    parser.add_argument("--limit", type=int, default=0,
+                        help="use at most this many cases (default: all)")
+    parser.add_argument("-k", dest="only", action="append",
+                        help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="minimum seconds per benchmark (default: 0.5)")
+    parser.add_argument("--min-rounds", type=int, default=20,
+                        help="minimum rounds per benchmark (default: 20)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="baseline JSON to compare against / save to (default: bench/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write this run's results to --baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed p50 slowdown vs. baseline as a fraction (default: 0.15)")
+    parser.add_argument("--json", metavar="PATH",
+                        help="also write this run's results as JSON to PATH ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("benchmarks", {})
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    api.warm_up()
+    fixtures = suite.load_fixtures(args.cases, args.limit)
+    if not fixtures:
+        print(f"No cases found in {args.cases}", file=sys.stderr)
+        return 2
+
+    baseline = {} if args.save_baseline else load_baseline(args.baseline)
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<36} {'ops/sec':>12} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10} {'vs base':>8}")
+    for name, stats in suite.run_suite(fixtures, args.only, args.min_time, args.min_rounds):
+        results[name] = stats
+        change = ""
+        base = baseline.get(name)
+        if base and base.get("p50_us"):
+            ratio = stats["p50_us"] / base["p50_us"] - 1.0
+            change = f"{ratio:+.1%}"
+            if ratio > args.threshold:
+                regressions.append((name, ratio))
+                change += " !"
+        print(
+            f"{name:<36} {stats['ops_per_sec']:>12,.0f} {stats['p50_us']:>10.2f} "
+            f"{stats['p90_us']:>10.2f} {stats['p99_us']:>10.2f} {change:>8}",
+            flush=True
+        )
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": len(fixtures),
+        "benchmarks": results
+    }
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    if args.json == "-":
+        print(json.dumps(report))
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        for name, ratio in regressions:
+            print(f"REGRESSION {name}: p50 {ratio:+.1%} (threshold {args.threshold:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Benchmark definitions and the timing loop.
+
+Fixtures come from the case corpus (cases/*.json, or a JSONL file of case
+objects): each case's inputs, its operator sequence and the result of
+running it. A benchmark is one round over all of its fixtures; it is
+repeated until both `min_rounds` and `min_time` are reached, and the
+per-call time of every round is one sample.
+"""
+import gc
+import json
+import math
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import api
+import engine
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES_DIR = os.path.join(BASE_DIR, "cases")
+PERCENTILES = (50, 90, 99)
+
+
+def iter_cases(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Case objects from a directory of *.json files or a JSONL file, streamed.
+    """
+    if os.path.isdir(path):
+        for fname in sorted(os.listdir(path)):
+            if fname.endswith(".json"):
+                yield engine.load_json(os.path.join(path, fname))
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_fixtures(path: str, limit: int = 0) -> List[Dict[str, Any]]:
+    fixtures = []
+    for case in iter_cases(path):
+        inputs = case.get("inputs", {})
+        sequence = case.get("operator_sequence", [])
+        try:
+            result = engine.run_inputs(case.get("case_id"), inputs, sequence, api.OPERATORS_DIR)
+        except Exception:
+            result = None
+        fixtures.append({
+            "case_id": case.get("case_id"),
+            "inputs": inputs,
+            "provided": set(inputs),
+            "sequence": sequence,
+            "result": result
+        })
+        if limit and len(fixtures) >= limit:
+            break
+    return fixtures
+
+
+def _eval_pairs(fixtures: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    # Every rule/gate expression of a case's operators, paired with the env
+    # after its run; expressions that raise there are left out.
+    pairs = []
+    for fx in fixtures:
+        state = fx["result"]["state"] if fx["result"] else {}
+        env = engine.build_env(fx["inputs"], state)
+        for op_id in fx["sequence"]:
+            try:
+                op = api.REGISTRY.get(op_id)
+            except FileNotFoundError:
+                continue
+            for expr in engine.operator_expressions(op):
+                try:
+                    engine.safe_eval(expr, env)
+                except Exception:
+                    continue
+                pairs.append((expr, env))
+    return pairs
+
+
+def _flow_inputs(fixtures: List[Dict[str, Any]], sequence: List[str]) -> List[Dict[str, Any]]:
+    runnable = []
+    for fx in fixtures:
+        try:
+            engine.run_inputs(fx["case_id"], fx["inputs"], sequence, api.OPERATORS_DIR)
+        except Exception:
+            continue
+        runnable.append(fx["inputs"])
+    return runnable
+
+
+def _runnable(fn: Callable[..., Any], arg_list: List[Tuple]) -> List[Tuple]:
+    # Argument tuples `fn` accepts; generated corpora include inputs the API
+    # rejects with an error, which would abort the timing loop.
+    usable = []
+    for args in arg_list:
+        try:
+            fn(*args)
+        except Exception:
+            continue
+        usable.append(args)
+    return usable
+
+
+def build_benchmarks(fixtures: List[Dict[str, Any]]) -> List[Tuple[str, Callable[[], None], int]]:
+    """
+    (name, round function, calls per round) for every benchmark with at
+    least one usable fixture.
+    """
+    safe_eval = engine.safe_eval
+    build_env = engine.build_env
+    benchmarks = []
+
+    pairs = _eval_pairs(fixtures)
+
+    def bench_safe_eval():
+        for expr, env in pairs:
+            safe_eval(expr, env)
+
+    state_pairs = [(fx["inputs"], fx["result"]["state"] if fx["result"] else {}) for fx in fixtures]
+
+    def bench_build_env():
+        for inputs, state in state_pairs:
+            build_env(inputs, state)
+
+    route_args = _runnable(api.route_operators, [(fx["inputs"], 3) for fx in fixtures])
+
+    def bench_route_operators():
+        for args in route_args:
+            api.route_operators(*args)
+
+    energy_args = _runnable(api.compute_energy, [
+        (
+            fx["inputs"],
+            fx["provided"],
+            len(fx["result"]["gates_triggered"]) if fx["result"] else 0,
+            fx["result"]["status"] if fx["result"] else "OK"
+        )
+        for fx in fixtures
+    ])
+
+    def bench_compute_energy():
+        for args in energy_args:
+            api.compute_energy(*args)
+
+    fulcrum_args = _runnable(api.identify_fulcrums, [(fx["inputs"], fx["provided"]) for fx in fixtures])
+
+    def bench_identify_fulcrums():
+        for args in fulcrum_args:
+            api.identify_fulcrums(*args)
+
+    benchmarks.append(("safe_eval", bench_safe_eval, len(pairs)))
+    benchmarks.append(("build_env", bench_build_env, len(state_pairs)))
+    benchmarks.append(("route_operators", bench_route_operators, len(route_args)))
+    benchmarks.append(("compute_energy", bench_compute_energy, len(energy_args)))
+    benchmarks.append(("identify_fulcrums", bench_identify_fulcrums, len(fulcrum_args)))
+
+    for flow_id, sequence in sorted(api.FLOWS.flows.items()):
+        flow_inputs = _flow_inputs(fixtures, sequence)
+
+        def bench_flow(sequence=sequence, flow_inputs=flow_inputs):
+            for inputs in flow_inputs:
+                engine.run_inputs("bench", inputs, sequence, api.OPERATORS_DIR)
+
+        benchmarks.append((f"run_inputs[{flow_id}]", bench_flow, len(flow_inputs)))
+
+    return [bench for bench in benchmarks if bench[2] > 0]
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    # Nearest-rank on an already sorted list.
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def measure(
+    round_fn: Callable[[], None],
+    calls: int,
+    min_time: float = 0.5,
+    min_rounds: int = 20,
+    warmup: int = 3
+) -> Dict[str, Any]:
+    """
+    Time `round_fn` and summarize per-call times in microseconds. GC is
+    disabled while timing so collections don't land in random rounds.
+    """
+    for _ in range(warmup):
+        round_fn()
+    samples = []
+    clock = time.perf_counter
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        started = clock()
+        while len(samples) < min_rounds or clock() - started < min_time:
+            t0 = clock()
+            round_fn()
+            samples.append(clock() - t0)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    total = sum(samples)
+    per_call = sorted(sample / calls * 1e6 for sample in samples)
+    stats = {
+        "calls_per_round": calls,
+        "rounds": len(samples),
+        "ops_per_sec": round(calls * len(samples) / total, 1) if total else 0.0,
+        "mean_us": round(sum(per_call) / len(per_call), 3),
+        "min_us": round(per_call[0], 3)
+    }
+    for pct in PERCENTILES:
+        stats[f"p{pct}_us"] = round(percentile(per_call, pct), 3)
+    return stats
+
+
+def run_suite(
+    fixtures: List[Dict[str, Any]],
+    only: Optional[List[str]] = None,
+    min_time: float = 0.5,
+    min_rounds: int = 20
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for name, round_fn, calls in build_benchmarks(fixtures):
+        if only and not any(pattern in name for pattern in only):
+            continue
+        yield name, measure(round_fn, calls, min_time, min_rounds)
@@ -0,0 +1,181 @@
+"""
+Precompiled operator bundle for fast cold starts.
+
+`python3 validate_ops.py --bundle` validates every operator, expression and
+flow, then writes one marshal file holding the parsed operators and
+flows.json, the compiled code object of every rule/gate expression, and the
+operators' truth tables. A process loading it skips JSON parsing,
+expression validation/compilation and truth-table enumeration.
+
+The bundle records BUNDLE_FORMAT, the Python bytecode magic number (code
+objects only load on the Python that made them) and the sha256 of every
+source file. `load` rejects a bundle when any of those differ, or when an
+operator file was added or removed, and callers fall back to the sources.
+"""
+import hashlib
+import importlib.util
+import json
+import marshal
+import os
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import engine
+
+
+BUNDLE_FORMAT = 1
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(BASE_DIR, "operators.bundle")
+
+
+class StaleBundle(Exception):
+    pass
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _operator_files(operators_dir: str) -> Dict[str, str]:
+    # file name -> absolute path, the set OperatorRegistry would load
+    with os.scandir(operators_dir) as entries:
+        return {
+            entry.name: os.path.abspath(entry.path)
+            for entry in entries
+            if entry.name.endswith(".json") and entry.is_file()
+        }
+
+
+def build(operators_dir: str, flows_path: str) -> Dict[str, Any]:
+    """
+    Bundle for the current sources. Expects them to have been validated.
+    """
+    operators = {}
+    sources = {}
+    expressions = {}
+    tables = {}
+    for name, path in sorted(_operator_files(operators_dir).items()):
+        sources[name] = _sha256(path)
+        op = engine.load_json(path)
+        operators[name] = op
+        for expr in engine.operator_expressions(op):
+            expressions[expr] = engine._compile_uncached(expr)
+        engine.build_truth_tables(op)
+        tables[name] = engine.truth_table_data(op)
+        engine.discard_truth_tables(op)
+
+    flows = {}
+    if os.path.exists(flows_path):
+        sources["flows.json"] = _sha256(flows_path)
+        flows = engine.load_json(flows_path)
+
+    return {
+        "format": BUNDLE_FORMAT,
+        "python": importlib.util.MAGIC_NUMBER,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "sources": sources,
+        "operators": operators,
+        "flows": flows,
+        "expressions": expressions,
+        "truth_tables": tables
+    }
+
+
+def write(bundle: Dict[str, Any], path: str) -> None:
+    # Write-then-rename so a running process never reads half a bundle.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        marshal.dump(bundle, f)
+    os.replace(tmp_path, path)
+
+
+def load(path: str, operators_dir: str, flows_path: str) -> Tuple[Dict[str, Any], Dict[str, Tuple[int, int]]]:
+    """
+    (bundle, stat signatures of the verified sources by file name). Raises
+    FileNotFoundError when there is no bundle and StaleBundle when it does
+    not match this Python or the sources.
+    """
+    with open(path, "rb") as f:
+        # one read: marshal.load on a file object reads in small pieces
+        data = f.read()
+    try:
+        bundle = marshal.loads(data)
+    except (EOFError, ValueError, TypeError) as exc:
+        raise StaleBundle(f"unreadable ({exc})")
+    if not isinstance(bundle, dict) or bundle.get("format") != BUNDLE_FORMAT:
+        raise StaleBundle("unsupported bundle format")
+    if bundle.get("python") != importlib.util.MAGIC_NUMBER:
+        raise StaleBundle("built by a different Python version")
+
+    sources = bundle["sources"]
+    files = _operator_files(operators_dir)
+    if set(files) != set(bundle["operators"]):
+        raise StaleBundle("operator files were added or removed")
+    checks = dict(files)
+    if os.path.exists(flows_path):
+        checks["flows.json"] = os.path.abspath(flows_path)
+    if set(checks) != set(sources):
+        raise StaleBundle("flows.json was added or removed")
+
+    signatures = {}
+    for name, file_path in checks.items():
+        # stat before hashing: a write after this point changes the
+        # signature, so the next refresh reloads the file.
+        st = os.stat(file_path)
+        if _sha256(file_path) != sources[name]:
+            raise StaleBundle(f"{name} changed since the bundle was built")
+        signatures[name] = (st.st_mtime_ns, st.st_size)
+    return bundle, signatures
+
+
+def install(bundle: Dict[str, Any], signatures: Dict[str, Tuple[int, int]], registry: engine.OperatorRegistry) -> None:
+    """
+    Seed the expression cache, truth tables and `registry` from a loaded
+    bundle.
+    """
+    engine.seed_expr_cache(bundle["expressions"])
+    by_file = {}
+    file_signatures = {}
+    for name, op in bundle["operators"].items():
+        # joined the way OperatorRegistry._scan names files
+        path = os.path.join(registry.operators_dir, name)
+        engine.install_truth_tables(op, bundle["truth_tables"].get(name))
+        by_file[path] = op
+        file_signatures[path] = signatures[name]
+    registry.seed(by_file, file_signatures)
+
+
+def load_into(
+    registry: engine.OperatorRegistry,
+    flows_path: Optional[str] = None,
+    path: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Load the bundle at `path` (OPERATOR_BUNDLE, default operators.bundle;
+    "0" disables) into `registry`. Returns the bundle, or None when there
+    is none or it is stale, in which case sources are loaded as usual.
+    """
+    path = path or os.environ.get("OPERATOR_BUNDLE", DEFAULT_PATH)
+    if path in ("0", "off", "false"):
+        return None
+    flows_path = flows_path or os.path.join(os.path.dirname(registry.operators_dir), "flows.json")
+    try:
+        bundle, signatures = load(path, registry.operators_dir, flows_path)
+    except FileNotFoundError:
+        return None
+    except StaleBundle as exc:
+        print(f"Ignoring operator bundle {path}: {exc}; rebuild with validate_ops.py --bundle", file=sys.stderr)
+        return None
+    install(bundle, signatures, registry)
+    bundle["signatures"] = signatures
+    return bundle
+
+
+def describe(bundle: Dict[str, Any]) -> str:
+    digest = hashlib.sha256(json.dumps(bundle["sources"], sort_keys=True).encode("utf-8")).hexdigest()
+    return (
+        f"format {bundle['format']}, {len(bundle['operators'])} operators, {len(bundle['flows'])} flows, "
+        f"{len(bundle['expressions'])} expressions, sources {digest[:12]}"
+    )
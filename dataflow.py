@@ -0,0 +1,447 @@
+"""
+Static read/write analysis of operators and dataflow planning over a
+sequence.
+
+Every name in an operator's rule `when`/`set_expr` and gate `when`
+expressions is a read; every `set`/`set_expr` key is a (possible) write.
+From these, `dependency_graph` links each operator in a sequence to the
+earlier operators it can observe: the writers of the keys it reads, and any
+earlier operator that can stop the run (a BLOCK_PROGRESS/REQUIRE_COMMITMENT
+gate, an unknown id, or an expression that cannot be analyzed).
+
+`run_planned` uses the graph to run only the operators that requested
+output keys transitively depend on. Requested keys get exactly the values a
+full `engine.run_inputs` would give them; the rest of the result covers only
+the operators that ran, and errors in skipped operators are not raised.
+
+`run_incremental` re-evaluates after some inputs changed, reusing the
+previous result up to the first operator that reads a changed key.
+"""
+import ast
+import json
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import engine
+
+
+def expr_names(expr: str) -> Set[str]:
+    """
+    Variable names an expression reads (`len` included, as rules may
+    shadow it with an input).
+    """
+    return {node.id for node in ast.walk(engine.parse_expr(expr)) if isinstance(node, ast.Name)}
+
+
+def _always(cond: str) -> bool:
+    # Same test engine.apply_rules / check_gates use to skip evaluation.
+    return cond.strip().lower() == "true"
+
+
+def _never(cond: str) -> bool:
+    try:
+        return not expr_names(cond) and not engine.safe_eval(cond, {})
+    except Exception:
+        return False
+
+
+def analyze_operator(op: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Read/write sets of one operator:
+    - reads: names read by rule conditions and set_expr values
+    - gate_reads: names read by gate conditions
+    - writes: keys any rule can put in the outputs
+    - must_writes: keys every run of the operator writes
+    - stop_gates: (gate, names it reads) for gates that can end the run
+    - opaque: some expression could not be parsed, so reads are unknown
+    """
+    reads: Set[str] = set()
+    gate_reads: Set[str] = set()
+    writes: Set[str] = set()
+    must: Optional[Set[str]] = None
+    covered = False
+    opaque = False
+
+    for rule in op.get("rules", []):
+        cond = rule.get("when", "true")
+        keys = set(rule.get("set", {}))
+        set_expr = rule.get("set_expr", {})
+        try:
+            if not _always(cond):
+                reads |= expr_names(cond)
+            if isinstance(set_expr, dict):
+                keys |= set(set_expr)
+                for expr in set_expr.values():
+                    reads |= expr_names(str(expr))
+        except (SyntaxError, ValueError):
+            opaque = True
+        writes |= keys
+        must = keys if must is None else must & keys
+        if _always(cond):
+            # first-match-wins: later rules are unreachable
+            covered = True
+            break
+
+    stop_gates = []
+    for gate in op.get("gates", []):
+        cond = gate.get("when", "false")
+        names: Set[str] = set()
+        try:
+            if not _always(cond):
+                names = expr_names(cond)
+        except (SyntaxError, ValueError):
+            opaque = True
+        gate_reads |= names
+        if gate.get("action") in engine.STOP_ACTIONS and not _never(cond):
+            stop_gates.append((gate, names))
+
+    return {
+        "reads": reads,
+        "gate_reads": gate_reads,
+        "writes": writes,
+        "must_writes": must if covered and must else set(),
+        "stop_gates": stop_gates,
+        "opaque": opaque
+    }
+
+
+_ANALYSES: Dict[Tuple[str, int, Tuple[str, ...]], List[Optional[Dict[str, Any]]]] = {}
+_ANALYSES_LOCK = threading.Lock()
+
+
+def analyze_sequence(sequence: List[str], operators_dir: str) -> List[Optional[Dict[str, Any]]]:
+    """
+    `analyze_operator` for each operator in `sequence` (None for unknown
+    ids), cached until the registry reloads.
+    """
+    registry = engine.get_registry(operators_dir)
+    registry.refresh()
+    key = (registry.operators_dir, registry.version, tuple(sequence))
+    cached = _ANALYSES.get(key)
+    if cached is not None:
+        return cached
+    effects = [
+        None if op is None else analyze_operator(op)
+        for _, op in engine.resolve_sequence(sequence, registry)
+    ]
+    with _ANALYSES_LOCK:
+        if len(_ANALYSES) >= 1024:
+            _ANALYSES.clear()
+        _ANALYSES[key] = effects
+    return effects
+
+
+def can_stop(effects: Optional[Dict[str, Any]]) -> bool:
+    return effects is None or effects["opaque"] or bool(effects["stop_gates"])
+
+
+def writers_of(key: str, effects: List[Optional[Dict[str, Any]]], before: int) -> List[int]:
+    """
+    Operators before index `before` whose output can be the value of `key`
+    at that point: the latest writers back to (and including) one that
+    always writes it.
+    """
+    found = []
+    for i in range(before - 1, -1, -1):
+        item = effects[i]
+        if item is not None and key in item["writes"]:
+            found.append(i)
+            if key in item["must_writes"]:
+                break
+    return found
+
+
+_DERIVED_FROM: Dict[Tuple[int, str], Tuple[List[Optional[Dict[str, Any]]], Any]] = {}
+
+
+def _memo(effects: List[Optional[Dict[str, Any]]], build: Callable[[List[Optional[Dict[str, Any]]]], Any]) -> Any:
+    # Per analyzed sequence: analyze_sequence returns the same list object
+    # until the registry reloads, so its identity is the cache key.
+    key = (id(effects), build.__name__)
+    cached = _DERIVED_FROM.get(key)
+    if cached is not None and cached[0] is effects:
+        return cached[1]
+    value = build(effects)
+    with _ANALYSES_LOCK:
+        if len(_DERIVED_FROM) >= 1024:
+            _DERIVED_FROM.clear()
+        _DERIVED_FROM[key] = (effects, value)
+    return value
+
+
+def _data_deps(effects: List[Optional[Dict[str, Any]]]) -> List[Set[int]]:
+    return _memo(effects, _build_data_deps)
+
+
+def _build_data_deps(effects: List[Optional[Dict[str, Any]]]) -> List[Set[int]]:
+    # Writer edges only.
+    graph: List[Set[int]] = []
+    for j, item in enumerate(effects):
+        deps: Set[int] = set()
+        if item is None or item["opaque"]:
+            deps.update(range(j))
+        else:
+            for name in item["reads"] | item["gate_reads"]:
+                if name not in engine.DERIVED_VARS:
+                    deps.update(writers_of(name, effects, j))
+        graph.append(deps)
+    return graph
+
+
+def dependency_graph(effects: List[Optional[Dict[str, Any]]], stop_free: Set[int] = frozenset()) -> List[Set[int]]:
+    """
+    For each position j, the earlier positions it depends on: writers of
+    the names it reads (derived variables never come from state) and every
+    earlier operator that can stop the run or cannot be analyzed, except
+    those in `stop_free` (known not to stop for the inputs at hand).
+    """
+    controls = [i for i, item in enumerate(effects) if can_stop(item) and i not in stop_free]
+    return [
+        deps | {i for i in controls if i < j}
+        for j, deps in enumerate(_data_deps(effects))
+    ]
+
+
+def plan(
+    effects: List[Optional[Dict[str, Any]]],
+    outputs: Iterable[str],
+    stop_free: Set[int] = frozenset(),
+    stop_at: Optional[int] = None
+) -> List[int]:
+    """
+    Positions to run, in order, so that every key in `outputs` ends with
+    the value a full run would give it, and the run ends with the full
+    run's status and stopping gates. `stop_free` and `stop_at` come from
+    `precheck`: operators known not to stop, and the position of a
+    guaranteed stop (nothing after it is planned).
+    """
+    limit = len(effects) if stop_at is None else stop_at + 1
+    data = _data_deps(effects)
+    # Every operator that may stop the run is kept (with what it reads), so
+    # the run stops, or not, exactly where a full run would.
+    pending = [i for i in range(limit) if i not in stop_free and can_stop(effects[i])]
+    for key in outputs:
+        pending.extend(writers_of(key, effects, limit))
+    selected: Set[int] = set()
+    while pending:
+        i = pending.pop()
+        if i not in selected:
+            selected.add(i)
+            pending.extend(data[i])
+    return sorted(selected)
+
+
+def input_only_stop_gates(effects: List[Optional[Dict[str, Any]]]) -> List[Tuple[List[Dict[str, Any]], bool]]:
+    """
+    Per position: the stop gates that read nothing the operators up to and
+    including that one can write (so their outcome is fixed by the inputs),
+    and whether that covers all of its stop gates. Ends at the first
+    unknown or unanalyzable operator.
+    """
+    return _memo(effects, _build_input_only_stop_gates)
+
+
+def _build_input_only_stop_gates(effects: List[Optional[Dict[str, Any]]]) -> List[Tuple[List[Dict[str, Any]], bool]]:
+    found = []
+    written: Set[str] = set()
+    for item in effects:
+        if item is None or item["opaque"]:
+            break
+        written |= item["writes"]
+        gates = [gate for gate, names in item["stop_gates"] if not names & written]
+        found.append((gates, len(gates) == len(item["stop_gates"])))
+    return found
+
+
+def precheck(case_inputs: Dict[str, Any], effects: List[Optional[Dict[str, Any]]]) -> Tuple[Optional[int], Set[int]]:
+    """
+    Evaluate the input-only stop gates against the inputs alone. Returns
+    the position of the earliest guaranteed stop (None if there is none)
+    and the positions before it whose stop gates are all input-only and
+    false, so they cannot stop this run.
+    """
+    env = engine.EvalEnv(case_inputs)
+    stop_free: Set[int] = set()
+    for position, (gates, complete) in enumerate(input_only_stop_gates(effects)):
+        decided = complete
+        for gate in gates:
+            cond = gate.get("when", "false")
+            try:
+                fires = _always(cond) or bool(engine.safe_eval(cond, env))
+            except Exception:
+                decided = False
+                continue
+            if fires:
+                return position, stop_free
+        if decided:
+            stop_free.add(position)
+    return None, stop_free
+
+
+def run_planned(
+    case_id: str,
+    case_inputs: Dict[str, Any],
+    sequence: List[str],
+    outputs: List[str],
+    operators_dir: str
+) -> Dict[str, Any]:
+    """
+    Run only the operators `outputs` depend on, plus those that may stop
+    the run, so `status` is the full run's. Input-only stop gates are
+    checked first (`precheck`): operators that cannot stop this run are not
+    kept for their gates, and nothing past a guaranteed stop is planned.
+    `state` holds just the requested keys (those the run produced);
+    `operators_ran` and `gates_triggered` cover only the operators that
+    ran, which `"partial": True` flags.
+    """
+    registry = engine.get_registry(operators_dir)
+    registry.refresh()
+    resolved = engine.resolve_sequence(sequence, registry)
+    effects = analyze_sequence(sequence, operators_dir)
+    stop_at, stop_free = precheck(case_inputs, effects)
+    selected = plan(effects, outputs, stop_free, stop_at)
+    result = engine._run_resolved(case_id, case_inputs, [resolved[i] for i in selected])
+    state = result["state"]
+    result["state"] = {key: state[key] for key in outputs if key in state}
+    result["partial"] = True
+    return result
+
+
+def affected_names(changed_keys: Iterable[str]) -> Set[str]:
+    """
+    Names whose value can differ when top-level inputs `changed_keys`
+    change: the keys themselves and derived variables read from them.
+    """
+    changed = set(changed_keys)
+    names = set(changed)
+    for name, derive in engine.DERIVED_VARS.items():
+        path = getattr(derive, "path", None)
+        if path is None or path.split(".", 1)[0] in changed:
+            names.add(name)
+    return names
+
+
+def resume_index(effects: List[Optional[Dict[str, Any]]], names: Set[str]) -> int:
+    """
+    Position of the first operator that reads any of `names` (or cannot be
+    analyzed); everything before it behaves exactly as in the previous run.
+    """
+    for j, item in enumerate(effects):
+        if item is None or item["opaque"] or (item["reads"] | item["gate_reads"]) & names:
+            return j
+    return len(effects)
+
+
+def _reusable_prefix(previous: Dict[str, Any], sequence: List[str], start: int):
+    # Returns (state, op_log, gate_log, finished) rebuilt from the first
+    # `start` operators of `previous`, or None if it does not fit `sequence`.
+    ran = previous["operators_ran"]
+    gates = previous["gates_triggered"]
+    status = previous["status"]
+    if status not in ("OK", "GATED"):
+        return None
+    if status == "OK" and len(ran) != len(sequence):
+        return None
+    # The previous run stopped before the first affected operator: it stops
+    # at the same gate again.
+    finished = status == "GATED" and start >= len(ran)
+    keep = len(ran) if finished else start
+    if keep > len(ran) or any(ran[k]["operator"] != sequence[k] for k in range(keep)):
+        return None
+
+    state: Dict[str, Any] = {}
+    op_log: List[Dict[str, Any]] = []
+    for entry in ran[:keep]:
+        out = dict(entry["outputs"])
+        state.update(out)
+        op_log.append({"operator": entry["operator"], "outputs": out})
+    # Gate entries are logged in operator order; the operator at `start`
+    # differs from the one before it (it reads a changed key, so the same
+    # operator one step earlier would have been the resume point).
+    count = 0
+    for k in range(keep):
+        while count < len(gates) and gates[count]["operator"] == sequence[k]:
+            count += 1
+    gate_log = [dict(gate) for gate in gates[:count]]
+    return state, op_log, gate_log, finished
+
+
+def run_incremental(
+    case_id: str,
+    case_inputs: Dict[str, Any],
+    sequence: List[str],
+    previous: Dict[str, Any],
+    changed_keys: Iterable[str],
+    operators_dir: str
+) -> Dict[str, Any]:
+    """
+    Same result as `engine.run_inputs(case_id, case_inputs, sequence, ...)`,
+    given `previous`, the result of running `sequence` with the same
+    operators on inputs that differ from `case_inputs` only in
+    `changed_keys` (changed, added or removed top-level keys). Operators
+    before the first one that reads a changed key (or a derived variable
+    built from one) are not rerun; their state, outputs and gate entries
+    are taken from `previous`. A `previous` that does not fit `sequence`
+    falls back to a full run.
+    """
+    registry = engine.get_registry(operators_dir)
+    registry.refresh()
+    resolved = engine.resolve_sequence(sequence, registry)
+    start = resume_index(analyze_sequence(sequence, operators_dir), affected_names(changed_keys))
+    try:
+        prefix = _reusable_prefix(previous, sequence, start)
+    except (AttributeError, KeyError, TypeError):
+        prefix = None
+    if prefix is None:
+        return engine._run_resolved(case_id, case_inputs, resolved)
+
+    state, op_log, gate_log, finished = prefix
+    if finished:
+        return {
+            "case_id": case_id,
+            "status": "GATED",
+            "state": state,
+            "operators_ran": op_log,
+            "gates_triggered": gate_log
+        }
+    return engine._run_resolved(case_id, case_inputs, resolved[start:], state, op_log, gate_log)
+
+
+def main() -> int:
+    if len(sys.argv) < 2:
+        print("Usage: python3 dataflow.py FLOW_ID [OUTPUT_KEY ...]")
+        return 1
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    operators_dir = os.path.join(base_dir, "operators")
+    flows = engine.load_json(os.path.join(base_dir, "flows.json"))
+    sequence = flows.get(sys.argv[1])
+    if not sequence:
+        print(f"Unknown flow: {sys.argv[1]}")
+        return 1
+
+    effects = analyze_sequence(sequence, operators_dir)
+    graph = dependency_graph(effects)
+    input_only = input_only_stop_gates(effects)
+    report = {"operators": [], "plan": None}
+    for i, (op_id, item) in enumerate(zip(sequence, effects)):
+        entry: Dict[str, Any] = {"operator": op_id, "depends_on": [sequence[d] for d in sorted(graph[i])]}
+        if item is not None:
+            entry.update(
+                reads=sorted(item["reads"] | item["gate_reads"]),
+                writes=sorted(item["writes"]),
+                can_stop=can_stop(item)
+            )
+        if i < len(input_only):
+            entry["input_only_stop_gates"] = [gate.get("id") for gate in input_only[i][0]]
+        report["operators"].append(entry)
+    if len(sys.argv) > 2:
+        report["plan"] = [sequence[i] for i in plan(effects, sys.argv[2:])]
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Per-case_id energy history used for EMA smoothing in api.py.
+
+Stores keep the last smoothed energy for each case_id with a bounded size
+(least recently used entries are evicted first) and an optional per-entry
+TTL. Entries are kept as compact tuples, not dicts; `get` rebuilds the
+potential/utilization/gap/ready_to_act dict the EMA code expects.
+
+MemoryEnergyStore is per process. SQLiteEnergyStore keeps the history in a
+WAL-mode SQLite file so several api.py processes on one host (pre-fork
+workers, restarts) share it.
+"""
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+ENERGY_FIELDS = ("potential", "utilization", "gap", "ready_to_act")
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_TTL = 86400.0
+# SQLite INTEGER is a signed 64-bit value.
+SQLITE_INT_MIN = -(2 ** 63)
+SQLITE_INT_MAX = 2 ** 63 - 1
+
+
+def pack_energy(energy: Dict[str, Any]) -> Tuple[Any, Any, Any, bool]:
+    return (
+        energy.get("potential"),
+        energy.get("utilization"),
+        energy.get("gap"),
+        bool(energy.get("ready_to_act"))
+    )
+
+
+def unpack_energy(entry: Tuple) -> Dict[str, Any]:
+    return {
+        "potential": entry[0],
+        "utilization": entry[1],
+        "gap": entry[2],
+        "ready_to_act": entry[3]
+    }
+
+
+def _sqlite_value(value: Any) -> Any:
+    """
+    `value` as something SQLite can bind: integers beyond 64 bits become
+    REAL (infinite past float range). Raises TypeError for other types.
+    """
+    if value is None or isinstance(value, (bool, float, str)):
+        return value
+    if isinstance(value, int):
+        if SQLITE_INT_MIN <= value <= SQLITE_INT_MAX:
+            return value
+        try:
+            return float(value)
+        except OverflowError:
+            return math.inf if value > 0 else -math.inf
+    raise TypeError(f"cannot store {type(value).__name__} in SQLite")
+
+
+class MemoryEnergyStore:
+    """
+    In-process LRU store. `max_entries` bounds the size; `ttl` (seconds,
+    0 or None for no expiry) drops entries not written for that long.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: Optional[float] = DEFAULT_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl) if ttl else 0.0
+        # case_id -> (potential, utilization, gap, ready_to_act, expires_at)
+        self._entries: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(case_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.ttl and entry[4] <= time.monotonic():
+                del self._entries[case_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(case_id)
+            self.hits += 1
+        return unpack_energy(entry)
+
+    def put(self, case_id: str, energy: Dict[str, Any]) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        entry = pack_energy(energy) + (expires_at,)
+        with self._lock:
+            self._entries[case_id] = entry
+            self._entries.move_to_end(case_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class SQLiteEnergyStore:
+    """
+    Shared store in a SQLite file (WAL journal, so readers never wait on the
+    writer). `put` only records the entry in memory; a background thread
+    writes pending entries in one transaction every `flush_interval`
+    seconds, so repeated puts for a case_id coalesce into one row write.
+    Reads see this process's pending entries first, then the file.
+
+    Size and TTL are enforced by the flusher about once a second. Eviction
+    drops the least recently written rows, which tracks LRU closely here
+    because every EMA read of a case_id is followed by a write.
+    """
+
+    backend = "sqlite"
+    max_pending = 1024
+    maintenance_interval = 1.0
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: Optional[float] = DEFAULT_TTL,
+        flush_interval: float = 0.05
+    ):
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl) if ttl else 0.0
+        self.flush_interval = flush_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.flushes = 0
+        self.dropped = 0
+        self._reset()
+        # Create the schema on a connection that is closed again right away:
+        # SQLite handles must not cross fork(), and pre-fork servers create
+        # the store in the supervisor. Each process (and thread) connects on
+        # first use.
+        conn = self._open()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS energy_history ("
+                "case_id TEXT PRIMARY KEY, potential, utilization, gap, "
+                "ready_to_act INTEGER, updated_at REAL) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS energy_history_updated ON energy_history (updated_at)")
+        finally:
+            conn.close()
+
+    def _reset(self) -> None:
+        # Also called in a forked child: the parent's pending writes, lock,
+        # connections and flusher thread belong to the parent.
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending: Dict[str, Tuple] = {}
+        self._flushing: Dict[str, Tuple] = {}
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher: Optional[threading.Thread] = None
+        self._next_maintenance = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            self._reset()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, case_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        with self._lock:
+            entry = self._pending.get(case_id) or self._flushing.get(case_id)
+        if entry is None:
+            entry = conn.execute(
+                "SELECT potential, utilization, gap, ready_to_act, updated_at "
+                "FROM energy_history WHERE case_id = ?",
+                (case_id,)
+            ).fetchone()
+        if entry is None or (self.ttl and entry[4] + self.ttl <= time.time()):
+            self.misses += 1
+            return None
+        self.hits += 1
+        energy = unpack_energy(entry)
+        energy["ready_to_act"] = bool(energy["ready_to_act"])
+        return energy
+
+    def put(self, case_id: str, energy: Dict[str, Any]) -> None:
+        if self._pid != os.getpid():
+            self._reset()
+        entry = pack_energy(energy) + (time.time(),)
+        with self._lock:
+            self._pending[case_id] = entry
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+            if len(self._pending) >= self.max_pending:
+                self._wake.set()
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Keep serving from memory; the entries are retried next tick.
+                pass
+            except Exception as exc:
+                # Never let the flusher die: `put` only restarts it on the
+                # next write, and pending entries would pile up until then.
+                print(f"energy store flush failed: {type(exc).__name__}: {exc}", file=sys.stderr)
+
+    def _rows(self, batch) -> list:
+        # Entries that cannot be bound are dropped (and logged), not
+        # retried forever.
+        rows = []
+        for case_id, entry in batch:
+            try:
+                rows.append((case_id,) + tuple(_sqlite_value(value) for value in entry))
+            except TypeError as exc:
+                self.dropped += 1
+                print(f"energy store dropped entry for {case_id!r}: {exc}", file=sys.stderr)
+        return rows
+
+    def flush(self) -> None:
+        """
+        Write pending entries now (one transaction) and run size/TTL
+        maintenance when due.
+        """
+        conn = self._connection()
+        with self._lock:
+            if self._pending:
+                self._flushing.update(self._pending)
+                self._pending = {}
+            batch = list(self._flushing.items())
+        if batch:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO energy_history "
+                    "(case_id, potential, utilization, gap, ready_to_act, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    self._rows(batch)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            with self._lock:
+                for case_id, entry in batch:
+                    if self._flushing.get(case_id) is entry:
+                        del self._flushing[case_id]
+            self.flushes += 1
+        now = time.monotonic()
+        if now >= self._next_maintenance:
+            self._next_maintenance = now + self.maintenance_interval
+            self._maintain(conn)
+
+    def _maintain(self, conn: sqlite3.Connection) -> None:
+        if self.ttl:
+            cur = conn.execute("DELETE FROM energy_history WHERE updated_at <= ?", (time.time() - self.ttl,))
+            self.expirations += max(cur.rowcount, 0)
+        (size,) = conn.execute("SELECT COUNT(*) FROM energy_history").fetchone()
+        if size > self.max_entries:
+            cur = conn.execute(
+                "DELETE FROM energy_history WHERE case_id IN ("
+                "SELECT case_id FROM energy_history ORDER BY updated_at LIMIT ?)",
+                (size - self.max_entries,)
+            )
+            self.evictions += max(cur.rowcount, 0)
+
+    def __len__(self) -> int:
+        (size,) = self._connection().execute("SELECT COUNT(*) FROM energy_history").fetchone()
+        return size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._flushing.clear()
+        self._connection().execute("DELETE FROM energy_history")
+
+    def close(self) -> None:
+        """
+        Stop the flusher and write anything still pending.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        self._closed = True
+        self._wake.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending) + len(self._flushing)
+        return {
+            "backend": self.backend,
+            "path": self.path,
+            "size": len(self),
+            "pending": pending,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "flushes": self.flushes,
+            "dropped": self.dropped
+        }
+
+
+def store_from_env():
+    """
+    Store configured by ENERGY_STORE ("memory", the default, or "sqlite"),
+    ENERGY_STORE_PATH (SQLite file), ENERGY_STORE_MAX (entries) and
+    ENERGY_STORE_TTL (seconds, 0 disables expiry).
+    """
+    max_entries = int(os.environ.get("ENERGY_STORE_MAX", str(DEFAULT_MAX_ENTRIES)))
+    ttl = float(os.environ.get("ENERGY_STORE_TTL", str(DEFAULT_TTL)))
+    backend = os.environ.get("ENERGY_STORE", "memory").lower()
+    if backend == "sqlite":
+        default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "energy_history.db")
+        path = os.environ.get("ENERGY_STORE_PATH", default_path)
+        return SQLiteEnergyStore(path, max_entries, ttl)
+    if backend != "memory":
+        raise ValueError(f"Unknown ENERGY_STORE backend: {backend}")
+    return MemoryEnergyStore(max_entries, ttl)
@@ -2,8 +2,13 @@ import json
 import os
 import sys
 import ast
+import hashlib
+import itertools
 import re
-from typing import Any, Dict, List
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 
 ALLOWED_AST_NODES = (
@@ -42,10 +47,23 @@ ALLOWED_AST_NODES = (
 )
 
 
-def safe_eval(expr: str, env: Dict[str, Any]) -> Any:
+EXPR_CACHE_SIZE = 4096
+
+_EVAL_GLOBALS = {"__builtins__": {}, "len": len}
+_EXPR_CACHE: "OrderedDict[str, Any]" = OrderedDict()
+_EXPR_CACHE_LOCK = threading.Lock()
+# misses/evictions are counted under _EXPR_CACHE_LOCK. Hits are the hot
+# path, so each thread counts its own in a shard (a one-item list) that
+# expr_cache_stats() sums, as metrics.py does.
+_EXPR_STATS = {"misses": 0, "evictions": 0}
+_EXPR_HITS = threading.local()
+_EXPR_HIT_SHARDS: List[List[int]] = []
+
+
+def parse_expr(expr: str) -> ast.Expression:
     """
-    Safely evaluate a restricted expression used in operator rules.
-    Allowed: boolean logic, comparisons, arithmetic, len(), dict/list access.
+    Parse a rule expression (JSON-style true/false/null) and check it against
+    the whitelist. Raises ValueError for disallowed constructs.
     """
     expr = expr.strip()
     expr = re.sub(r"\btrue\b", "True", expr)
@@ -60,8 +78,304 @@ def safe_eval(expr: str, env: Dict[str, Any]) -> Any:
             # allow only len(...)
             if not isinstance(node.func, ast.Name) or node.func.id != "len":
                 raise ValueError("Only len(...) calls are allowed.")
-    compiled = compile(tree, "<rule>", "eval")
-    return eval(compiled, {"__builtins__": {}}, {"len": len, **env})
+    return tree
+
+
+def _compile_uncached(expr: str) -> Any:
+    return compile(parse_expr(expr), "<rule>", "eval")
+
+
+def compile_expr(expr: str) -> Any:
+    """
+    Validated code object for a rule expression, memoized by expression text
+    in a bounded LRU. Invalid expressions raise and are not cached.
+    """
+    code = _EXPR_CACHE.get(expr)
+    if code is not None:
+        hits = getattr(_EXPR_HITS, "shard", None)
+        if hits is None:
+            hits = _EXPR_HITS.shard = [0]
+            with _EXPR_CACHE_LOCK:
+                _EXPR_HIT_SHARDS.append(hits)
+        hits[0] += 1
+        try:
+            _EXPR_CACHE.move_to_end(expr)
+        except KeyError:
+            # evicted by another thread since the lookup
+            pass
+        return code
+    code = _compile_uncached(expr)
+    with _EXPR_CACHE_LOCK:
+        _EXPR_STATS["misses"] += 1
+        _EXPR_CACHE[expr] = code
+        while len(_EXPR_CACHE) > EXPR_CACHE_SIZE:
+            _EXPR_CACHE.popitem(last=False)
+            _EXPR_STATS["evictions"] += 1
+    return code
+
+
+def expr_cache_stats() -> Dict[str, int]:
+    with _EXPR_CACHE_LOCK:
+        hits = sum(shard[0] for shard in _EXPR_HIT_SHARDS)
+        return {"size": len(_EXPR_CACHE), "max_size": EXPR_CACHE_SIZE, "hits": hits, **_EXPR_STATS}
+
+
+def seed_expr_cache(codes: Dict[str, Any]) -> None:
+    """
+    Install already validated code objects (from a bundle) by expression text.
+    """
+    with _EXPR_CACHE_LOCK:
+        for expr, code in codes.items():
+            _EXPR_CACHE[expr] = code
+        while len(_EXPR_CACHE) > EXPR_CACHE_SIZE:
+            _EXPR_CACHE.popitem(last=False)
+            _EXPR_STATS["evictions"] += 1
+
+
+def clear_expr_cache() -> None:
+    with _EXPR_CACHE_LOCK:
+        _EXPR_CACHE.clear()
+        for key in _EXPR_STATS:
+            _EXPR_STATS[key] = 0
+        for shard in _EXPR_HIT_SHARDS:
+            shard[0] = 0
+
+
+def safe_eval(expr: str, env: Dict[str, Any]) -> Any:
+    """
+    Safely evaluate a restricted expression used in operator rules.
+    Allowed: boolean logic, comparisons, arithmetic, len(), dict/list access.
+    """
+    return eval(compile_expr(expr), _EVAL_GLOBALS, env)
+
+
+def operator_expressions(op: Dict[str, Any]) -> List[str]:
+    """
+    Every expression `apply_rules`/`check_gates` may evaluate for `op`.
+    """
+    exprs = []
+    for rule in op.get("rules", []):
+        cond = rule.get("when", "true")
+        if cond.strip().lower() != "true":
+            exprs.append(cond)
+        set_expr = rule.get("set_expr", {})
+        if isinstance(set_expr, dict):
+            exprs.extend(str(expr) for expr in set_expr.values())
+    for gate in op.get("gates", []):
+        cond = gate.get("when", "false")
+        if cond.strip().lower() != "true":
+            exprs.append(cond)
+    return exprs
+
+
+def precompile_operator(op: Dict[str, Any]) -> None:
+    """
+    Warm the expression cache for `op` and build its truth tables. Invalid
+    expressions are left to raise when they are evaluated, as they would
+    without precompilation.
+    """
+    for expr in operator_expressions(op):
+        try:
+            compile_expr(expr)
+        except (SyntaxError, ValueError):
+            pass
+    build_truth_tables(op)
+
+
+# Truth tables: when every rule (or gate) condition of an operator only
+# compares names with ==, !=, in or not in against scalar literals, the
+# outcome depends only on which literal each name equals, if any. Those
+# outcomes are enumerated once per operator and looked up per run.
+TRUTH_TABLE_MAX = 4096
+_TABLE_LITERALS = (bool, int, float, str, type(None))
+# Stands for "equal to none of this name's literals" while enumerating.
+_UNMATCHED = object()
+# Lookup result when a name is not in env: evaluate normally instead, so
+# NameErrors and short-circuiting stay exactly as before.
+_FALLBACK = object()
+# id(op) -> (op, rules table, gates table); op is kept to detect id reuse.
+_TRUTH_TABLES: Dict[int, Tuple[Dict[str, Any], Optional["TruthTable"], Optional["TruthTable"]]] = {}
+
+
+def _finite_literals(node: ast.AST, literals: Dict[str, List[Any]]) -> bool:
+    if isinstance(node, ast.Expression):
+        return _finite_literals(node.body, literals)
+    if isinstance(node, ast.BoolOp):
+        return all(_finite_literals(value, literals) for value in node.values)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        return _finite_literals(node.operand, literals)
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, _TABLE_LITERALS)
+    if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+        return False
+    left, op, right = node.left, node.ops[0], node.comparators[0]
+    if isinstance(op, (ast.Eq, ast.NotEq)):
+        if isinstance(right, ast.Name):
+            left, right = right, left
+        values = [right]
+    elif isinstance(op, (ast.In, ast.NotIn)) and isinstance(right, (ast.Tuple, ast.List)):
+        values = right.elts
+    else:
+        return False
+    if not isinstance(left, ast.Name):
+        return False
+    for value in values:
+        if not isinstance(value, ast.Constant) or not isinstance(value.value, _TABLE_LITERALS):
+            return False
+        literals.setdefault(left.id, []).append(value.value)
+    return True
+
+
+class TruthTable:
+    """
+    Outcome of a fixed list of conditions for every combination of literal
+    classes of the names they read. A name's class is the index of the
+    first of its literals it equals (found by hashing, which agrees with ==
+    for JSON values), or 0 for none of them. Outcomes are stored flat,
+    indexed by the classes read as a mixed-radix number.
+    """
+
+    __slots__ = ("names", "columns", "outcomes")
+
+    def __init__(self, names: List[str], classes: List[Dict[Any, int]], outcomes: List[Any]):
+        self.names = names
+        # (name, literal -> class, stride)
+        self.columns: List[Tuple[str, Dict[Any, int], int]] = []
+        stride = 1
+        for name, index in reversed(list(zip(names, classes))):
+            self.columns.insert(0, (name, index, stride))
+            stride *= len(index) + 1
+        self.outcomes = outcomes
+
+    def lookup(self, env: Dict[str, Any]) -> Any:
+        key = 0
+        for name, classes, stride in self.columns:
+            try:
+                value = env[name]
+            except KeyError:
+                return _FALLBACK
+            try:
+                key += classes.get(value, 0) * stride
+            except TypeError:
+                # unhashable (list/dict): equal to no scalar literal
+                pass
+        return self.outcomes[key]
+
+
+def truth_table(conditions: List[str], outcome: Callable[[List[bool]], Any]) -> Optional[TruthTable]:
+    """
+    Table of `outcome(results of conditions)` over every class combination,
+    or None if a condition is not finite-domain or the table would exceed
+    TRUTH_TABLE_MAX entries.
+    """
+    literals: Dict[str, List[Any]] = {}
+    codes = []
+    for cond in conditions:
+        if cond.strip().lower() == "true":
+            codes.append(None)
+            continue
+        try:
+            if not _finite_literals(parse_expr(cond), literals):
+                return None
+            codes.append(compile_expr(cond))
+        except (SyntaxError, ValueError):
+            return None
+
+    names = sorted(literals)
+    classes: List[Dict[Any, int]] = []
+    representatives: List[List[Any]] = []
+    size = 1
+    for name in names:
+        index: Dict[Any, int] = {}
+        reps = [_UNMATCHED]
+        for value in literals[name]:
+            if value not in index:
+                index[value] = len(reps)
+                reps.append(value)
+        classes.append(index)
+        representatives.append(reps)
+        size *= len(reps)
+        if size > TRUTH_TABLE_MAX:
+            return None
+
+    # product() varies the last name fastest, matching TruthTable's strides.
+    outcomes = []
+    for key in itertools.product(*(range(len(reps)) for reps in representatives)):
+        env = {name: reps[i] for name, reps, i in zip(names, representatives, key)}
+        results = [True if code is None else bool(eval(code, _EVAL_GLOBALS, env)) for code in codes]
+        outcomes.append(outcome(results))
+    return TruthTable(names, classes, outcomes)
+
+
+def _first_true(results: List[bool]) -> Optional[int]:
+    for index, ok in enumerate(results):
+        if ok:
+            return index
+    return None
+
+
+def _all_true(results: List[bool]) -> Tuple[int, ...]:
+    return tuple(index for index, ok in enumerate(results) if ok)
+
+
+def build_truth_tables(op: Dict[str, Any]) -> None:
+    """
+    Tabulate `op`'s rule matching and gate triggering where possible. Rules
+    after an unconditional one are never reached and are left out.
+    """
+    conditions = []
+    for rule in op.get("rules", []):
+        cond = rule.get("when", "true")
+        conditions.append(cond)
+        if cond.strip().lower() == "true":
+            break
+    rules = truth_table(conditions, _first_true) if conditions else None
+    gate_conditions = [gate.get("when", "false") for gate in op.get("gates", [])]
+    gates = truth_table(gate_conditions, _all_true) if gate_conditions else None
+    if rules is None and gates is None:
+        _TRUTH_TABLES.pop(id(op), None)
+    else:
+        _TRUTH_TABLES[id(op)] = (op, rules, gates)
+
+
+def discard_truth_tables(op: Dict[str, Any]) -> None:
+    entry = _TRUTH_TABLES.get(id(op))
+    if entry is not None and entry[0] is op:
+        _TRUTH_TABLES.pop(id(op), None)
+
+
+def _table_data(table: Optional[TruthTable]) -> Optional[Tuple[List[str], List[Dict[Any, int]], List[Any]]]:
+    if table is None:
+        return None
+    return table.names, [classes for _, classes, _ in table.columns], table.outcomes
+
+
+def truth_table_data(op: Dict[str, Any]) -> Optional[Tuple[Any, Any]]:
+    """
+    `op`'s tables as plain (names, classes, outcomes) data, or None.
+    """
+    entry = _tables_for(op)
+    if entry is None:
+        return None
+    return _table_data(entry[1]), _table_data(entry[2])
+
+
+def install_truth_tables(op: Dict[str, Any], data: Optional[Tuple[Any, Any]]) -> None:
+    """
+    Attach tables exported by `truth_table_data` instead of rebuilding them.
+    """
+    if data is None:
+        discard_truth_tables(op)
+        return
+    rules, gates = (None if part is None else TruthTable(*part) for part in data)
+    _TRUTH_TABLES[id(op)] = (op, rules, gates)
+
+
+def _tables_for(op: Dict[str, Any]):
+    entry = _TRUTH_TABLES.get(id(op))
+    if entry is not None and entry[0] is op:
+        return entry
+    return None
 
 
 def deep_get(d: Dict[str, Any], path: str) -> Any:
@@ -88,42 +402,193 @@ def load_json(path: str) -> Dict[str, Any]:
         return json.load(f)
 
 
+class OperatorRegistry:
+    """
+    Index of operator definitions keyed by `id`, built from `operators/*.json`.
+    Files are parsed once; `refresh()` re-stats the directory and reloads only
+    files whose mtime or size changed, so edits are picked up without a restart.
+    """
+
+    def __init__(self, operators_dir: str, check_interval: float = 1.0):
+        self.operators_dir = operators_dir
+        self.check_interval = check_interval
+        self.version = 0
+        # sha256 over the loaded operator definitions; changes with any edit.
+        self.content_hash = ""
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._by_file: Dict[str, Dict[str, Any]] = {}
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._last_check: Optional[float] = None
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        signatures = {}
+        with os.scandir(self.operators_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    st = entry.stat()
+                    signatures[entry.path] = (st.st_mtime_ns, st.st_size)
+        return signatures
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload changed operator files. Checks are throttled to `check_interval`
+        seconds unless `force` is set. Returns True if the index changed.
+        """
+        now = time.monotonic()
+        if (
+            not force
+            and self._last_check is not None
+            and now - self._last_check < self.check_interval
+        ):
+            return False
+        with self._lock:
+            self._last_check = now
+            signatures = self._scan()
+            if signatures == self._signatures:
+                return False
+
+            by_file: Dict[str, Dict[str, Any]] = {}
+            for path, sig in signatures.items():
+                if self._signatures.get(path) == sig:
+                    by_file[path] = self._by_file[path]
+                    continue
+                try:
+                    by_file[path] = load_json(path)
+                    precompile_operator(by_file[path])
+                except (OSError, ValueError):
+                    # A file caught mid-write keeps its last good version and
+                    # is retried on the next refresh.
+                    if path not in self._by_file:
+                        raise
+                    by_file[path] = self._by_file[path]
+                    signatures[path] = self._signatures[path]
+
+            self._install(by_file, signatures)
+            return True
+
+    def seed(self, by_file: Dict[str, Dict[str, Any]], signatures: Dict[str, Tuple[int, int]]) -> None:
+        """
+        Install operators that were loaded and precompiled elsewhere (a
+        bundle). `signatures` are the stats they correspond to, so the next
+        refresh reloads only files changed since.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            self._install(dict(by_file), dict(signatures))
+
+    def _install(self, by_file: Dict[str, Dict[str, Any]], signatures: Dict[str, Tuple[int, int]]) -> None:
+        index: Dict[str, Dict[str, Any]] = {}
+        for path in sorted(by_file):
+            op = by_file[path]
+            index.setdefault(op.get("id"), op)
+
+        digest = hashlib.sha256()
+        for op_id in sorted(index, key=str):
+            digest.update(json.dumps(index[op_id], sort_keys=True).encode("utf-8"))
+
+        kept = {id(op) for op in by_file.values()}
+        for op in self._by_file.values():
+            if id(op) not in kept:
+                discard_truth_tables(op)
+        self._signatures = signatures
+        self._by_file = by_file
+        self._index = index
+        self.content_hash = digest.hexdigest()
+        self.version += 1
+
+    def get(self, op_id: str) -> Dict[str, Any]:
+        if self._last_check is None:
+            self.refresh()
+        op = self._index.get(op_id)
+        if op is None:
+            raise FileNotFoundError(f"Operator not found: {op_id}")
+        return op
+
+    def ids(self) -> List[str]:
+        if self._last_check is None:
+            self.refresh()
+        return sorted(self._index)
+
+
+_REGISTRIES: Dict[str, OperatorRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_registry(operators_dir: str) -> OperatorRegistry:
+    """
+    Shared registry per operators directory, so every caller uses one index.
+    """
+    key = os.path.abspath(operators_dir)
+    registry = _REGISTRIES.get(key)
+    if registry is None:
+        with _REGISTRIES_LOCK:
+            registry = _REGISTRIES.get(key)
+            if registry is None:
+                registry = OperatorRegistry(key)
+                _REGISTRIES[key] = registry
+    return registry
+
+
 def load_operator(op_id: str, operators_dir: str) -> Dict[str, Any]:
-    # Operator files named by id, but easier: keep one file per operator and map by filename.
-    # We'll scan all and match `id`.
-    for fname in os.listdir(operators_dir):
-        if fname.endswith(".json"):
-            op = load_json(os.path.join(operators_dir, fname))
-            if op.get("id") == op_id:
-                return op
-    raise FileNotFoundError(f"Operator not found: {op_id}")
+    registry = get_registry(operators_dir)
+    registry.refresh()
+    return registry.get(op_id)
 
 
-def apply_rules(op: Dict[str, Any], env: Dict[str, Any]) -> Dict[str, Any]:
-    outputs = {}
-    matched = False
-    for rule in op.get("rules", []):
+# Gate actions that end a run with status GATED.
+STOP_ACTIONS = ("BLOCK_PROGRESS", "REQUIRE_COMMITMENT")
+
+
+def match_rules(op: Dict[str, Any], env: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int]]:
+    """
+    `apply_rules` that also returns the index of the matching rule (None
+    when no rule matched).
+    """
+    tables = _tables_for(op)
+    if tables is not None and tables[1] is not None:
+        index = tables[1].lookup(env)
+        if index is not _FALLBACK:
+            if index is None:
+                return {}, None
+            return _rule_outputs(op["rules"][index], env), index
+    for index, rule in enumerate(op.get("rules", [])):
         cond = rule.get("when", "true")
         if cond.strip().lower() == "true":
             ok = True
         else:
             ok = bool(safe_eval(cond, env))
         if ok:
-            outputs.update(rule.get("set", {}))
-            set_expr = rule.get("set_expr", {})
-            if isinstance(set_expr, dict):
-                for key, expr in set_expr.items():
-                    outputs[key] = safe_eval(str(expr), env)
-            matched = True
             # first-match-wins for determinism
-            break
-    if not matched:
-        # If no rule matches, outputs remain empty (still deterministic)
-        pass
+            return _rule_outputs(rule, env), index
+    # If no rule matches, outputs remain empty (still deterministic)
+    return {}, None
+
+
+def _rule_outputs(rule: Dict[str, Any], env: Dict[str, Any]) -> Dict[str, Any]:
+    outputs = {}
+    outputs.update(rule.get("set", {}))
+    set_expr = rule.get("set_expr", {})
+    if isinstance(set_expr, dict):
+        for key, expr in set_expr.items():
+            outputs[key] = safe_eval(str(expr), env)
     return outputs
 
 
+def apply_rules(op: Dict[str, Any], env: Dict[str, Any]) -> Dict[str, Any]:
+    return match_rules(op, env)[0]
+
+
 def check_gates(op: Dict[str, Any], env: Dict[str, Any]) -> List[Dict[str, Any]]:
+    tables = _tables_for(op)
+    if tables is not None and tables[2] is not None:
+        indexes = tables[2].lookup(env)
+        if indexes is not _FALLBACK:
+            gates = op["gates"]
+            return [
+                {"id": gates[i].get("id"), "action": gates[i].get("action"), "message": gates[i].get("message")}
+                for i in indexes
+            ]
     triggered = []
     for gate in op.get("gates", []):
         cond = gate.get("when", "false")
@@ -140,6 +605,46 @@ def check_gates(op: Dict[str, Any], env: Dict[str, Any]) -> List[Dict[str, Any]]
     return triggered
 
 
+def path_getter(path: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Precompiled `deep_get` for a fixed dotted path.
+    """
+    parts = tuple(path.split("."))
+
+    def get(d: Dict[str, Any]) -> Any:
+        cur: Any = d
+        for part in parts:
+            if isinstance(cur, dict) and part in cur:
+                cur = cur[part]
+            else:
+                return None
+        return cur
+
+    return get
+
+
+def _derived(path: str, default: Callable[[], Any]) -> Callable[[Dict[str, Any]], Any]:
+    get = path_getter(path)
+    derive = lambda case_inputs: get(case_inputs) or default()
+    # dataflow.py maps derived names back to the input key they read.
+    derive.path = path
+    return derive
+
+
+# Convenience: flatten some nested values for rule simplicity.
+# These always shadow inputs and state of the same name.
+DERIVED_VARS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    # Evidence shortcuts:
+    "jc_inquiries": _derived("evidence.job_coaching.recent_client_inquiries", int),
+    "tool_paying_users": _derived("evidence.tool_development.paying_users", int),
+    "runway_months": _derived("personal_constraints.financial_runway_months", int),
+    "hours_per_week": _derived("personal_constraints.available_hours_per_week", int),
+    # Assumptions lists:
+    "jc_assumptions": _derived("assumptions.job_coaching", list),
+    "tool_assumptions": _derived("assumptions.tool_development", list),
+}
+
+
 def build_env(case_inputs: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Build the environment visible to rules:
@@ -150,39 +655,105 @@ def build_env(case_inputs: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, A
     env = {}
     env.update(case_inputs)
     env.update(state)
+    for key, derive in DERIVED_VARS.items():
+        env[key] = derive(case_inputs)
+    return env
 
-    # Convenience: flatten some nested values for rule simplicity
-    # Evidence shortcuts:
-    env["jc_inquiries"] = deep_get(case_inputs, "evidence.job_coaching.recent_client_inquiries") or 0
-    env["tool_paying_users"] = deep_get(case_inputs, "evidence.tool_development.paying_users") or 0
-    env["runway_months"] = deep_get(case_inputs, "personal_constraints.financial_runway_months") or 0
-    env["hours_per_week"] = deep_get(case_inputs, "personal_constraints.available_hours_per_week") or 0
 
-    # Assumptions lists:
-    env["jc_assumptions"] = deep_get(case_inputs, "assumptions.job_coaching") or []
-    env["tool_assumptions"] = deep_get(case_inputs, "assumptions.tool_development") or []
+class EvalEnv(dict):
+    """
+    Layered equivalent of `build_env`: derived variables over state over
+    case inputs. The dict itself is the state overlay; input and derived
+    values are resolved on first lookup and memoized, so a run shares one
+    env that `update_state` advances in place.
+    """
 
-    return env
+    __slots__ = ("inputs",)
+
+    def __init__(self, case_inputs: Dict[str, Any]):
+        super().__init__()
+        self.inputs = case_inputs
+
+    def __missing__(self, key: str) -> Any:
+        derive = DERIVED_VARS.get(key)
+        if derive is not None:
+            value = derive(self.inputs)
+        elif key in self.inputs:
+            value = self.inputs[key]
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+    def update_state(self, out: Dict[str, Any]) -> None:
+        for key, value in out.items():
+            if key not in DERIVED_VARS:
+                self[key] = value
 
 
 def run_case(case_path: str, operators_dir: str) -> Dict[str, Any]:
     case = load_json(case_path)
     case_inputs = case.get("inputs", {})
     sequence = case.get("operator_sequence", [])
+    return run_inputs(case.get("case_id"), case_inputs, sequence, operators_dir)
 
-    state: Dict[str, Any] = {}   # accumulated outputs
-    gate_log: List[Dict[str, Any]] = []
-    op_log: List[Dict[str, Any]] = []
 
+def resolve_sequence(sequence: List[str], registry: OperatorRegistry) -> List[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Pair each operator id with its definition, or None if it is unknown.
+    Unknown operators only raise when a run reaches them, as before.
+    """
+    resolved = []
     for op_id in sequence:
-        op = load_operator(op_id, operators_dir)
-        env = build_env(case_inputs, state)
+        try:
+            resolved.append((op_id, registry.get(op_id)))
+        except FileNotFoundError:
+            resolved.append((op_id, None))
+    return resolved
+
+
+# Optional callback (op_id, seconds, matched rule index, triggered gates)
+# invoked after every operator `_run_resolved` runs; api.py sets it when
+# metrics are enabled.
+OPERATOR_OBSERVER: Optional[Callable[[str, float, Optional[int], List[Dict[str, Any]]], None]] = None
+
+
+def _run_resolved(
+    case_id: str,
+    case_inputs: Dict[str, Any],
+    resolved: List[Tuple[str, Optional[Dict[str, Any]]]],
+    state: Optional[Dict[str, Any]] = None,
+    op_log: Optional[List[Dict[str, Any]]] = None,
+    gate_log: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Run `resolved` in order. `state`, `op_log` and `gate_log` resume a run
+    whose earlier operators already produced them; they are extended in place.
+    """
+    state = {} if state is None else state
+    gate_log = [] if gate_log is None else gate_log
+    op_log = [] if op_log is None else op_log
 
-        out = apply_rules(op, env)
+    env = EvalEnv(case_inputs)
+    if state:
+        env.update_state(state)
+    observe = OPERATOR_OBSERVER
+
+    for op_id, op in resolved:
+        if op is None:
+            raise FileNotFoundError(f"Operator not found: {op_id}")
+
+        if observe is None:
+            out = apply_rules(op, env)
+        else:
+            started = time.perf_counter()
+            out, matched = match_rules(op, env)
         state.update(out)
+        env.update_state(out)
 
-        env2 = build_env(case_inputs, state)
-        gates = check_gates(op, env2)
+        gates = check_gates(op, env)
+        if observe is not None:
+            observe(op_id, time.perf_counter() - started, matched, gates)
 
         op_log.append({
             "operator": op_id,
@@ -192,10 +763,9 @@ def run_case(case_path: str, operators_dir: str) -> Dict[str, Any]:
         if gates:
             gate_log.extend([{"operator": op_id, **g} for g in gates])
             # deterministic stop if any gate says BLOCK_PROGRESS or REQUIRE_COMMITMENT
-            stop_actions = {"BLOCK_PROGRESS", "REQUIRE_COMMITMENT"}
-            if any(g["action"] in stop_actions for g in gates):
+            if any(g["action"] in STOP_ACTIONS for g in gates):
                 return {
-                    "case_id": case.get("case_id"),
+                    "case_id": case_id,
                     "status": "GATED",
                     "state": state,
                     "operators_ran": op_log,
@@ -203,7 +773,7 @@ def run_case(case_path: str, operators_dir: str) -> Dict[str, Any]:
                 }
 
     return {
-        "case_id": case.get("case_id"),
+        "case_id": case_id,
         "status": "OK",
         "state": state,
         "operators_ran": op_log,
@@ -211,20 +781,104 @@ def run_case(case_path: str, operators_dir: str) -> Dict[str, Any]:
     }
 
 
-def run_inputs(case_id: str, case_inputs: Dict[str, Any], sequence: List[str], operators_dir: str) -> Dict[str, Any]:
+def _us(seconds: float) -> float:
+    return round(seconds * 1e6, 1)
+
+
+def trace_rules(op: Dict[str, Any], env: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[int], List[Dict[str, Any]]]:
+    """
+    `match_rules` that also records each condition tried (index, text,
+    outcome, evaluation time in microseconds) and the time taken to build
+    the matching rule's outputs.
+    """
+    clock = time.perf_counter
+    outputs = {}
+    steps = []
+    for index, rule in enumerate(op.get("rules", [])):
+        cond = rule.get("when", "true")
+        started = clock()
+        if cond.strip().lower() == "true":
+            ok = True
+        else:
+            ok = bool(safe_eval(cond, env))
+        step = {"rule": index, "when": cond, "matched": ok, "us": _us(clock() - started)}
+        steps.append(step)
+        if ok:
+            started = clock()
+            outputs.update(rule.get("set", {}))
+            set_expr = rule.get("set_expr", {})
+            if isinstance(set_expr, dict):
+                for key, expr in set_expr.items():
+                    outputs[key] = safe_eval(str(expr), env)
+            step["set_us"] = _us(clock() - started)
+            return outputs, index, steps
+    return outputs, None, steps
+
+
+def trace_gates(op: Dict[str, Any], env: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    `check_gates` that also records every gate evaluated.
+    """
+    clock = time.perf_counter
+    triggered = []
+    steps = []
+    for gate in op.get("gates", []):
+        cond = gate.get("when", "false")
+        started = clock()
+        if cond.strip().lower() == "true":
+            ok = True
+        else:
+            ok = bool(safe_eval(cond, env))
+        steps.append({
+            "gate": gate.get("id"),
+            "when": cond,
+            "action": gate.get("action"),
+            "triggered": ok,
+            "us": _us(clock() - started)
+        })
+        if ok:
+            triggered.append({
+                "id": gate.get("id"),
+                "action": gate.get("action"),
+                "message": gate.get("message")
+            })
+    return triggered, steps
+
+
+def _run_traced(
+    case_id: str,
+    case_inputs: Dict[str, Any],
+    resolved: List[Tuple[str, Optional[Dict[str, Any]]]]
+) -> Dict[str, Any]:
+    """
+    `_run_resolved` plus a "trace" list with one entry per operator run:
+    rules tried, the matching index, gates evaluated and step durations.
+    Kept separate so untraced runs pay nothing for it.
+    """
+    clock = time.perf_counter
     state: Dict[str, Any] = {}
     gate_log: List[Dict[str, Any]] = []
     op_log: List[Dict[str, Any]] = []
+    trace: List[Dict[str, Any]] = []
+    env = EvalEnv(case_inputs)
+    status = "OK"
 
-    for op_id in sequence:
-        op = load_operator(op_id, operators_dir)
-        env = build_env(case_inputs, state)
+    for op_id, op in resolved:
+        if op is None:
+            raise FileNotFoundError(f"Operator not found: {op_id}")
 
-        out = apply_rules(op, env)
+        started = clock()
+        out, matched, rule_steps = trace_rules(op, env)
         state.update(out)
-
-        env2 = build_env(case_inputs, state)
-        gates = check_gates(op, env2)
+        env.update_state(out)
+        gates, gate_steps = trace_gates(op, env)
+        trace.append({
+            "operator": op_id,
+            "rules": rule_steps,
+            "matched_rule": matched,
+            "gates": gate_steps,
+            "us": _us(clock() - started)
+        })
 
         op_log.append({
             "operator": op_id,
@@ -233,25 +887,84 @@ def run_inputs(case_id: str, case_inputs: Dict[str, Any], sequence: List[str], o
 
         if gates:
             gate_log.extend([{"operator": op_id, **g} for g in gates])
-            stop_actions = {"BLOCK_PROGRESS", "REQUIRE_COMMITMENT"}
-            if any(g["action"] in stop_actions for g in gates):
-                return {
-                    "case_id": case_id,
-                    "status": "GATED",
-                    "state": state,
-                    "operators_ran": op_log,
-                    "gates_triggered": gate_log
-                }
+            if any(g["action"] in STOP_ACTIONS for g in gates):
+                status = "GATED"
+                break
 
     return {
         "case_id": case_id,
-        "status": "OK",
+        "status": status,
         "state": state,
         "operators_ran": op_log,
-        "gates_triggered": gate_log
+        "gates_triggered": gate_log,
+        "trace": trace
     }
 
 
+def run_inputs(
+    case_id: str,
+    case_inputs: Dict[str, Any],
+    sequence: List[str],
+    operators_dir: str,
+    trace: bool = False
+) -> Dict[str, Any]:
+    """
+    Run `sequence` on `case_inputs`. With `trace=True` the result also has
+    a "trace" list (see `_run_traced`).
+    """
+    registry = get_registry(operators_dir)
+    registry.refresh()
+    resolved = resolve_sequence(sequence, registry)
+    if trace:
+        return _run_traced(case_id, case_inputs, resolved)
+    return _run_resolved(case_id, case_inputs, resolved)
+
+
+_NO_ITEM = object()
+
+
+def _paired(case_ids: Iterable[str], inputs_list: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    for case_id, case_inputs in itertools.zip_longest(case_ids, inputs_list, fillvalue=_NO_ITEM):
+        if case_id is _NO_ITEM or case_inputs is _NO_ITEM:
+            raise ValueError("case_ids and inputs differ in length")
+        yield case_id, case_inputs
+
+
+def run_batch(
+    inputs_list: Iterable[Dict[str, Any]],
+    sequence: List[str],
+    operators_dir: str,
+    case_ids: Optional[Iterable[str]] = None,
+    lazy: bool = False
+) -> Any:
+    """
+    Evaluate many input sets against one sequence. Operators are resolved
+    (and their expressions compiled) once for the whole batch; each result
+    is identical to `run_inputs` for that case, including early GATED stops.
+    Case ids default to the item's position; given ones must pair up with
+    the inputs one to one, else ValueError (raised up front for sized
+    arguments, otherwise when the shorter one runs out). With `lazy=True`
+    results are yielded one at a time, so inputs can be streamed in as well.
+    """
+    if case_ids is not None and hasattr(case_ids, "__len__") and hasattr(inputs_list, "__len__"):
+        if len(case_ids) != len(inputs_list):
+            raise ValueError(f"{len(case_ids)} case_ids for {len(inputs_list)} inputs")
+    registry = get_registry(operators_dir)
+    registry.refresh()
+    resolved = resolve_sequence(sequence, registry)
+    if case_ids is None:
+        pairs = ((str(i), case_inputs) for i, case_inputs in enumerate(inputs_list))
+    else:
+        pairs = _paired(case_ids, inputs_list)
+    results = (
+        _run_resolved(case_id, case_inputs, resolved)
+        for case_id, case_inputs in pairs
+    )
+    if lazy:
+        return results
+    return list(results)
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python3 engine.py cases/case_x.json")
@@ -261,6 +974,11 @@ def main():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     operators_dir = os.path.join(base_dir, "operators")
 
+    # A fresh bundle (validate_ops.py --bundle) saves parsing and compiling
+    # every operator; stale or missing ones fall back to the sources.
+    import bundle
+    bundle.load_into(get_registry(operators_dir))
+
     result = run_case(case_path, operators_dir)
     print(json.dumps(result, indent=2, ensure_ascii=False))
 
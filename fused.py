@@ -0,0 +1,211 @@
+import ast
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Tuple
+
+import engine
+
+
+STOP_ACTIONS = engine.STOP_ACTIONS
+FUSED_CACHE_SIZE = 256
+
+_FUSED: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[int, Callable]]" = OrderedDict()
+_FUSED_LOCK = threading.Lock()
+
+
+def _overlay(env: Dict[str, Any], out: Dict[str, Any]) -> None:
+    # Same layering as engine.EvalEnv.update_state, on a fully built env.
+    for key, value in out.items():
+        if key not in engine.DERIVED_VARS:
+            env[key] = value
+
+
+class _InlineNames(ast.NodeTransformer):
+    # Rewrites every variable read as a lookup in the local `env` dict.
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        lookup = ast.Subscript(
+            value=ast.Name(id="env", ctx=ast.Load()),
+            slice=ast.Constant(value=node.id),
+            ctx=ast.Load()
+        )
+        if node.id != "len":
+            return lookup
+        return ast.IfExp(
+            test=ast.Compare(
+                left=ast.Constant(value="len"),
+                ops=[ast.In()],
+                comparators=[ast.Name(id="env", ctx=ast.Load())]
+            ),
+            body=lookup,
+            orelse=ast.Name(id="_len", ctx=ast.Load())
+        )
+
+
+def inline_expr(expr: str) -> str:
+    """
+    Python source for a rule expression with names read from `env`.
+    A missing name raises KeyError instead of NameError; fused functions
+    hand any exception back to the interpreter, which raises the real one.
+    """
+    tree = _InlineNames().visit(engine.parse_expr(expr))
+    return "(" + ast.unparse(ast.fix_missing_locations(tree).body) + ")"
+
+
+class _Emitter:
+    def __init__(self):
+        self.lines: List[str] = []
+        self.consts: Dict[str, Any] = {}
+
+    def const(self, prefix: str, value: Any) -> str:
+        name = f"_{prefix}{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    def emit(self, indent: int, line: str) -> None:
+        self.lines.append("    " * indent + line)
+
+
+def _emit_result(em: _Emitter, indent: int, status: str) -> None:
+    em.emit(indent, "return {")
+    em.emit(indent + 1, '"case_id": case_id,')
+    em.emit(indent + 1, f'"status": {status!r},')
+    em.emit(indent + 1, '"state": state,')
+    em.emit(indent + 1, '"operators_ran": op_log,')
+    em.emit(indent + 1, '"gates_triggered": gate_log')
+    em.emit(indent, "}")
+
+
+def _emit_rules(em: _Emitter, op: Dict[str, Any]) -> None:
+    branch = "if"
+    for rule in op.get("rules", []):
+        cond = rule.get("when", "true")
+        always = cond.strip().lower() == "true"
+        if always:
+            if branch == "if":
+                indent = 2
+            else:
+                em.emit(2, "else:")
+                indent = 3
+        else:
+            em.emit(2, f"{branch} {inline_expr(cond)}:")
+            indent = 3
+        em.emit(indent, f"out = dict({em.const('s', rule.get('set', {}))})")
+        set_expr = rule.get("set_expr", {})
+        if isinstance(set_expr, dict):
+            for key, expr in set_expr.items():
+                em.emit(indent, f"out[{em.const('k', key)}] = {inline_expr(str(expr))}")
+        if always:
+            return
+        branch = "elif"
+    if branch == "if":
+        em.emit(2, "out = {}")
+    else:
+        em.emit(2, "else:")
+        em.emit(3, "out = {}")
+
+
+def _emit_gates(em: _Emitter, op_id: str, op: Dict[str, Any]) -> None:
+    gates = op.get("gates", [])
+    may_stop = any(gate.get("action") in STOP_ACTIONS for gate in gates)
+    if may_stop:
+        em.emit(2, "stop = False")
+    for gate in gates:
+        cond = gate.get("when", "false")
+        if cond.strip() == "false":
+            continue
+        entry = em.const("g", {
+            "operator": op_id,
+            "id": gate.get("id"),
+            "action": gate.get("action"),
+            "message": gate.get("message")
+        })
+        if cond.strip().lower() == "true":
+            indent = 2
+        else:
+            em.emit(2, f"if {inline_expr(cond)}:")
+            indent = 3
+        em.emit(indent, f"gate_log.append(dict({entry}))")
+        if gate.get("action") in STOP_ACTIONS:
+            em.emit(indent, "stop = True")
+    if may_stop:
+        em.emit(2, "if stop:")
+        _emit_result(em, 3, "GATED")
+
+
+def compile_sequence(sequence: List[str], operators_dir: str) -> Callable[[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Generate one function that runs `sequence` exactly as `engine.run_inputs`
+    would: rule chains become inlined if/elif blocks, gates and the
+    BLOCK_PROGRESS/REQUIRE_COMMITMENT stop are built in, and the environment
+    is updated in place instead of rebuilt per operator. Any exception (a
+    missing variable, a bad comparison, an unknown operator) reruns the case
+    through `engine.run_inputs` so errors surface exactly as before.
+    """
+    registry = engine.get_registry(operators_dir)
+
+    def interpret(case_id: str, case_inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return engine.run_inputs(case_id, case_inputs, list(sequence), operators_dir)
+
+    em = _Emitter()
+    em.emit(0, "def fused_flow(case_id, case_inputs):")
+    em.emit(1, "try:")
+    em.emit(2, "state = {}")
+    em.emit(2, "gate_log = []")
+    em.emit(2, "op_log = []")
+    em.emit(2, "env = _build_env(case_inputs, state)")
+    try:
+        for op_id in sequence:
+            em.emit(2, f"# {op_id}")
+            try:
+                op = registry.get(op_id)
+            except FileNotFoundError:
+                em.emit(2, "raise LookupError")
+                break
+            _emit_rules(em, op)
+            em.emit(2, "state.update(out)")
+            em.emit(2, "_overlay(env, out)")
+            em.emit(2, f"op_log.append({{'operator': {em.const('o', op_id)}, 'outputs': out}})")
+            _emit_gates(em, op_id, op)
+        else:
+            _emit_result(em, 2, "OK")
+    except (SyntaxError, ValueError):
+        return interpret
+    em.emit(1, "except Exception:")
+    em.emit(2, "return _interpret(case_id, case_inputs)")
+
+    source = "\n".join(em.lines) + "\n"
+    namespace = {
+        "_len": len,
+        "_build_env": engine.build_env,
+        "_overlay": _overlay,
+        "_interpret": interpret,
+        **em.consts
+    }
+    exec(compile(source, f"<fused {len(sequence)} ops>", "exec"), namespace)
+    fn = namespace["fused_flow"]
+    fn.__source__ = source
+    return fn
+
+
+def get_fused(sequence: List[str], operators_dir: str) -> Callable[[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compiled function for `sequence`, regenerated when the registry reloads.
+    """
+    registry = engine.get_registry(operators_dir)
+    registry.refresh()
+    key = (registry.operators_dir, tuple(sequence))
+    cached = _FUSED.get(key)
+    if cached is not None and cached[0] == registry.version:
+        return cached[1]
+    version = registry.version
+    fn = compile_sequence(tuple(sequence), operators_dir)
+    with _FUSED_LOCK:
+        _FUSED[key] = (version, fn)
+        _FUSED.move_to_end(key)
+        while len(_FUSED) > FUSED_CACHE_SIZE:
+            _FUSED.popitem(last=False)
+    return fn
+
+
+def run_fused(case_id: str, case_inputs: Dict[str, Any], sequence: List[str], operators_dir: str) -> Dict[str, Any]:
+    return get_fused(sequence, operators_dir)(case_id, case_inputs)
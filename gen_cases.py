@@ -0,0 +1,402 @@
+"""
+Synthetic case generator for load and scale testing.
+
+    python3 gen_cases.py [FLOW ...] --count 10000 --seed 7 > corpus.jsonl
+
+For each flow in flows.json it streams JSON lines
+{"case_id", "flow_id", "inputs", "operator_sequence"}: the shape of a case
+file, of a /evaluate(_batch) payload, and of a `python3 -m bench --cases`
+line. Nothing is held in memory beyond the case being written.
+
+Input domains come from the operators themselves: every literal a name is
+compared against in a `when`/`set_expr` expression (with values either side
+of numeric thresholds and a non-matching value for string/enum tests),
+`len(name)` comparisons for list inputs, names compared with each other,
+the keys in api.OPERATOR_INPUTS, and values seen in the cases/ corpus.
+Derived variables (engine.DERIVED_VARS) are written to the nested input
+paths they read.
+
+Generation first searches for inputs that reach every rule branch and gate
+of each operator in the flow, emitting each case that covers something new,
+then fills the rest of `--count` with random draws. Every emitted case runs
+through engine without error. Output is reproducible for a given seed, and
+each flow's stream does not depend on which other flows are selected.
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import api
+import dataflow
+import engine
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OTHER = "OTHER"
+NUMERIC_POOL = (0, 0.25, 0.5, 1, 5, 10, 50, 100)
+BOOL_POOL = (True, False)
+
+
+def _add(domain: Dict[str, Dict[str, Any]], name: str, values) -> None:
+    bucket = domain.setdefault(name, {})
+    for value in values:
+        # keyed by JSON so True/1 and 1/1.0 stay distinct
+        bucket.setdefault(json.dumps(value, sort_keys=True), value)
+
+
+def _around(value: Any) -> List[Any]:
+    if isinstance(value, bool):
+        return list(BOOL_POOL)
+    if isinstance(value, int):
+        return [value - 1, value, value + 1]
+    if isinstance(value, float):
+        return [round(value - 0.05, 6), value, round(value + 0.05, 6)]
+    if value is None:
+        return [None]
+    return [value, OTHER]
+
+
+def _constant(node: ast.AST) -> Tuple[bool, Any]:
+    if isinstance(node, ast.Constant):
+        return True, node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+        return True, -node.operand.value
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_constant(elt) for elt in node.elts]
+        if all(ok for ok, _ in items):
+            return True, [value for _, value in items]
+    return False, None
+
+
+def _len_target(node: ast.AST) -> Optional[str]:
+    if (
+        isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "len"
+        and len(node.args) == 1 and isinstance(node.args[0], ast.Name)
+    ):
+        return node.args[0].id
+    return None
+
+
+def collect_domains(
+    ops: List[Dict[str, Any]],
+    domain: Dict[str, Dict[str, Any]],
+    lengths: Dict[str, Set[int]],
+    links: List[Tuple[str, str]],
+    numeric: Set[str]
+) -> None:
+    """
+    Candidate values for every name the operators compare against a
+    literal; `lengths` gets list sizes from len(name) tests, `links` pairs
+    of names compared with each other, `numeric` names used in arithmetic.
+    """
+    for op in ops:
+        for expr in engine.operator_expressions(op):
+            try:
+                tree = engine.parse_expr(expr)
+            except (SyntaxError, ValueError):
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, ast.BinOp):
+                    for side in (node.left, node.right):
+                        if isinstance(side, ast.Name):
+                            numeric.add(side.id)
+                elif isinstance(node, ast.BoolOp):
+                    for value in node.values:
+                        if isinstance(value, ast.Name):
+                            _add(domain, value.id, BOOL_POOL)
+                elif isinstance(node, ast.Compare):
+                    operands = [node.left] + node.comparators
+                    for left, cmp, right in zip(operands, node.ops, operands[1:]):
+                        for a, b in ((left, right), (right, left)):
+                            ok, value = _constant(b)
+                            if isinstance(a, ast.Name) and isinstance(b, ast.Name):
+                                links.append((a.id, b.id))
+                            elif isinstance(a, ast.Name) and ok:
+                                if isinstance(cmp, (ast.In, ast.NotIn)) and isinstance(value, list):
+                                    _add(domain, a.id, value + [OTHER])
+                                else:
+                                    _add(domain, a.id, _around(value))
+                            elif _len_target(a) and ok and isinstance(value, int):
+                                lengths.setdefault(_len_target(a), set()).update(
+                                    n for n in _around(value) if n >= 0
+                                )
+
+
+def corpus_values(cases_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Top-level input values seen in cases/, plus nested values under the
+    dotted paths derived variables read.
+    """
+    seen: Dict[str, Dict[str, Any]] = {}
+    if not os.path.isdir(cases_dir):
+        return seen
+    derived_paths = {name: getattr(derive, "path", None) for name, derive in engine.DERIVED_VARS.items()}
+    for fname in sorted(os.listdir(cases_dir)):
+        if not fname.endswith(".json"):
+            continue
+        inputs = engine.load_json(os.path.join(cases_dir, fname)).get("inputs", {})
+        for key, value in inputs.items():
+            if not isinstance(value, dict):
+                _add(seen, key, [value])
+        for name, path in derived_paths.items():
+            value = engine.path_getter(path)(inputs) if path else None
+            if value is not None:
+                _add(seen, name, [value])
+    return seen
+
+
+def _set_path(inputs: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    cur = inputs
+    for part in parts[:-1]:
+        cur = cur.setdefault(part, {})
+    cur[parts[-1]] = value
+
+
+class FlowGenerator:
+    """
+    Domains, coverage targets and a case stream for one operator sequence.
+    """
+
+    def __init__(self, flow_id: str, sequence: List[str], corpus: Dict[str, Dict[str, Any]]):
+        self.flow_id = flow_id
+        self.sequence = sequence
+        self.resolved = engine.resolve_sequence(sequence, api.REGISTRY)
+        ops = [op for _, op in self.resolved if op is not None]
+
+        domain: Dict[str, Dict[str, Any]] = {}
+        lengths: Dict[str, Set[int]] = {}
+        links: List[Tuple[str, str]] = []
+        numeric: Set[str] = set()
+        collect_domains(ops, domain, lengths, links, numeric)
+
+        # Names the flow reads before any operator is sure to write them,
+        # plus what /route_and_evaluate requires up front.
+        names: Dict[str, None] = {}
+        always_written: Set[str] = set()
+        analyses = dataflow.analyze_sequence(sequence, api.OPERATORS_DIR)
+        for effects in analyses:
+            if effects is None:
+                continue
+            # Gates run after the operator's own rules have written.
+            for reads in (effects["reads"], None, effects["gate_reads"]):
+                if reads is None:
+                    always_written |= effects["must_writes"]
+                    continue
+                for name in sorted(reads - always_written - {"len"}):
+                    names.setdefault(name)
+        for op_id in sequence:
+            for name in api.OPERATOR_INPUTS.get(op_id, []):
+                names.setdefault(name)
+
+        for a, b in links:
+            if a in names and b in names:
+                merged = list(domain.get(a, {}).values()) + list(domain.get(b, {}).values())
+                _add(domain, a, merged)
+                _add(domain, b, merged)
+
+        self.names = list(names)
+        # Per position, the generated names its operator reads.
+        self.op_names = [
+            [] if effects is None else [name for name in self.names if name in effects["reads"] | effects["gate_reads"]]
+            for effects in analyses
+        ]
+        self.choices: Dict[str, List[Any]] = {}
+        for name in self.names:
+            values = dict(domain.get(name, {}))
+            if name in lengths:
+                values = {}
+                _add({name: values}, name, [[f"{name}_{i}" for i in range(n)] for n in sorted(lengths[name])])
+            for key, value in corpus.get(name, {}).items():
+                values.setdefault(key, value)
+            if not values:
+                pool = NUMERIC_POOL if name in numeric else BOOL_POOL
+                values = {json.dumps(value): value for value in pool}
+            self.choices[name] = list(values.values())
+
+        self.targets: List[Tuple[str, str, Any]] = []
+        for op_id, op in self.resolved:
+            if op is None:
+                continue
+            for index, rule in enumerate(op.get("rules", [])):
+                self.targets.append((op_id, "rule", index))
+                if dataflow._always(rule.get("when", "true")):
+                    break
+            for gate in op.get("gates", []):
+                if not dataflow._never(gate.get("when", "false")):
+                    self.targets.append((op_id, "gate", gate.get("id")))
+        self.covered: Set[Tuple[str, str, Any]] = set()
+        self.rejected = 0
+
+    def draw(self, rng: random.Random) -> Dict[str, Any]:
+        inputs: Dict[str, Any] = {}
+        for name in self.names:
+            value = rng.choice(self.choices[name])
+            derive = engine.DERIVED_VARS.get(name)
+            if derive is not None and getattr(derive, "path", None):
+                _set_path(inputs, derive.path, value)
+            else:
+                inputs[name] = value
+        return inputs
+
+    def trace(self, inputs: Dict[str, Any]) -> Tuple[Set[Tuple[str, str, Any]], int]:
+        """
+        Rule branches and gates `inputs` reach and the position the run
+        ended at, with the same first-match and stop semantics as engine;
+        raises what a real run would raise.
+        """
+        hits = set()
+        env = engine.EvalEnv(inputs)
+        position = 0
+        for position, (op_id, op) in enumerate(self.resolved):
+            if op is None:
+                raise FileNotFoundError(f"Operator not found: {op_id}")
+            out, matched = engine.match_rules(op, env)
+            if matched is not None:
+                hits.add((op_id, "rule", matched))
+            env.update_state(out)
+            gates = engine.check_gates(op, env)
+            hits.update((op_id, "gate", gate["id"]) for gate in gates)
+            if any(gate["action"] in engine.STOP_ACTIONS for gate in gates):
+                break
+        return hits, position
+
+    def _valid(self, inputs: Dict[str, Any]) -> Optional[Tuple[Set[Tuple[str, str, Any]], int]]:
+        try:
+            return self.trace(inputs)
+        except Exception:
+            self.rejected += 1
+            return None
+
+    def mutate(self, parent: Dict[str, Any], ended_at: int, rng: random.Random) -> Dict[str, Any]:
+        # Redraw a few names of an input that reached new branches. Deep
+        # operators are only reached past every earlier stop gate, so most
+        # mutations redraw the names of the operator the parent stopped at.
+        inputs = json.loads(json.dumps(parent))
+        frontier = self.op_names[ended_at]
+        if frontier and rng.random() < 0.7:
+            redraw = [name for name in frontier if rng.random() < 0.5] or [rng.choice(frontier)]
+        else:
+            redraw = rng.sample(self.names, min(len(self.names), rng.randint(1, 3)))
+        for name in redraw:
+            value = rng.choice(self.choices[name])
+            derive = engine.DERIVED_VARS.get(name)
+            if derive is not None and getattr(derive, "path", None):
+                _set_path(inputs, derive.path, value)
+            else:
+                inputs[name] = value
+        return inputs
+
+    def generate(self, count: int, rng: random.Random, attempts_per_target: int = 200) -> Iterator[Dict[str, Any]]:
+        """
+        Up to `count` cases: first ones that each reach a branch or gate not
+        reached before, then random draws.
+        """
+        emitted = 0
+        budget = attempts_per_target * len(self.targets)
+        parents: List[Tuple[Dict[str, Any], int]] = []
+        while emitted < count and budget > 0 and len(self.covered) < len(self.targets):
+            budget -= 1
+            if parents and rng.random() < 0.8:
+                parent, ended_at = rng.choice(parents)
+                inputs = self.mutate(parent, ended_at, rng)
+            else:
+                inputs = self.draw(rng)
+            traced = self._valid(inputs)
+            if traced is None or traced[0] <= self.covered:
+                continue
+            hits, ended_at = traced
+            self.covered |= hits
+            parents.append((inputs, ended_at))
+            yield self._case(emitted, inputs)
+            emitted += 1
+
+        failures = 0
+        while emitted < count:
+            inputs = self.draw(rng)
+            traced = self._valid(inputs)
+            if traced is None:
+                failures += 1
+                if failures > 1000 and failures > 10 * emitted:
+                    raise RuntimeError(f"{self.flow_id}: generated inputs keep failing to run")
+                continue
+            self.covered |= traced[0]
+            yield self._case(emitted, inputs)
+            emitted += 1
+
+    def _case(self, index: int, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "case_id": f"gen_{self.flow_id}_{index:06d}",
+            "flow_id": self.flow_id,
+            "inputs": inputs,
+            "operator_sequence": self.sequence
+        }
+
+    def coverage(self) -> Dict[str, Any]:
+        return {
+            "flow_id": self.flow_id,
+            "targets": len(self.targets),
+            "covered": len(self.covered & set(self.targets)),
+            "rejected": self.rejected,
+            "uncovered": [list(target) for target in self.targets if target not in self.covered]
+        }
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Stream synthetic cases for flows as JSON lines.")
+    parser.add_argument("flows", nargs="*", help="flow ids from flows.json (default: all)")
+    parser.add_argument("--count", type=int, default=1000, help="cases per flow (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--out", default="-", help="output JSONL path (default: stdout)")
+    parser.add_argument("--cases-dir", default=os.path.join(BASE_DIR, "cases"),
+                        help="corpus to take extra input values from (default: cases/)")
+    parser.add_argument("--coverage-json", metavar="PATH",
+                        help="write per-flow rule/gate coverage as JSON to PATH ('-' for stderr)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    api.warm_up()
+    flows = api.FLOWS.flows
+    unknown = [flow_id for flow_id in args.flows if flow_id not in flows]
+    if unknown:
+        print(f"Unknown flow(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    corpus = corpus_values(args.cases_dir)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    report = []
+    try:
+        for flow_id in args.flows or list(flows):
+            generator = FlowGenerator(flow_id, flows[flow_id], corpus)
+            rng = random.Random(f"{args.seed}:{flow_id}")
+            written = 0
+            for case in generator.generate(args.count, rng):
+                out.write(json.dumps(case, separators=(",", ":")) + "\n")
+                written += 1
+            coverage = generator.coverage()
+            report.append(coverage)
+            print(
+                f"{flow_id}: {written} cases, {coverage['covered']}/{coverage['targets']} "
+                f"branches and gates covered",
+                file=sys.stderr
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.coverage_json == "-":
+        print(json.dumps(report, indent=2), file=sys.stderr)
+    elif args.coverage_json:
+        with open(args.coverage_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+In-process counters and histograms rendered in the Prometheus text
+exposition format for api.py's GET /metrics.
+
+Every thread writes only to its own shard (plain dicts reached through a
+threading.local), so recording takes no lock; a scrape sums the shards.
+Shards of finished threads are kept so counters never go backwards.
+Metrics are per process: under PREFORK_WORKERS each scrape reports the
+worker that answered it.
+"""
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+OPERATOR_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Metrics:
+    """
+    Registry of metric definitions plus per-thread shards. Label values are
+    passed as a tuple in the order the metric was defined with.
+    """
+
+    def __init__(self):
+        # name -> (type, help, label names, buckets)
+        self.definitions: Dict[str, Tuple[str, str, Tuple[str, ...], Optional[Tuple[float, ...]]]] = {}
+        self._local = threading.local()
+        self._shards: List[Tuple[Dict, Dict]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.definitions[name] = ("counter", help_text, tuple(labels), None)
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.definitions[name] = ("histogram", help_text, tuple(labels), tuple(sorted(buckets)))
+
+    def _shard(self) -> Tuple[Dict, Dict]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            # (counters, histograms); registered once per thread
+            shard = ({}, {})
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Tuple = (), value: float = 1) -> None:
+        counters = self._shard()[0]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Tuple, value: float) -> None:
+        histograms = self._shard()[1]
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            buckets = self.definitions[name][3]
+            # [per-bucket counts (last one is +Inf), sum, bucket bounds]
+            entry = histograms[key] = [[0] * (len(buckets) + 1), 0.0, buckets]
+        entry[0][bisect.bisect_left(entry[2], value)] += 1
+        entry[1] += value
+
+    def _merged(self) -> Tuple[Dict, Dict]:
+        with self._lock:
+            shards = list(self._shards)
+        counters: Dict[Tuple[str, Tuple], float] = {}
+        histograms: Dict[Tuple[str, Tuple], List] = {}
+        for shard_counters, shard_histograms in shards:
+            # Copies: the owning thread may add keys while we read.
+            for key, value in list(shard_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, (counts, total, buckets) in list(shard_histograms.items()):
+                merged = histograms.get(key)
+                if merged is None:
+                    histograms[key] = [list(counts), total, buckets]
+                else:
+                    merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                    merged[1] += total
+        return counters, histograms
+
+    def render(self, gauges: Iterable[Tuple[str, str, str, Sequence[str], Iterable[Tuple[Tuple, float]]]] = ()) -> str:
+        """
+        Text exposition of every defined metric that has samples, followed
+        by `gauges`: (name, type, help, label names, [(label values, value)])
+        computed by the caller at scrape time.
+        """
+        counters, histograms = self._merged()
+        lines: List[str] = []
+        for name, (kind, help_text, label_names, _) in self.definitions.items():
+            if kind == "counter":
+                samples = sorted((labels, value) for (metric, labels), value in counters.items() if metric == name)
+                if not samples:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(label_names, labels)} {_number(value)}")
+                continue
+            samples = sorted((labels, entry) for (metric, labels), entry in histograms.items() if metric == name)
+            if not samples:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, (counts, total, buckets) in samples:
+                cumulative = 0
+                for bound, count in zip(buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = 'le="' + ("+Inf" if bound == float("inf") else repr(bound)) + '"'
+                    lines.append(f"{name}_bucket{_labels(label_names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(label_names, labels)} {repr(total)}")
+                lines.append(f"{name}_count{_labels(label_names, labels)} {cumulative}")
+        for name, kind, help_text, label_names, samples in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(label_names, labels)} {_number(float(value))}")
+        return "\n".join(lines) + "\n"
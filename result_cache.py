@@ -0,0 +1,111 @@
+"""
+Content-addressed cache of operator-run results for api.py.
+
+Entries are keyed by a sha256 of the canonical JSON of (inputs, resolved
+operator sequence); the cache as a whole is tied to a generation (the
+operator-set content hash and the flows.json signature) and is emptied when
+the generation changes. Size is bounded by an estimate of each result's
+serialized bytes, evicting least recently used entries first.
+
+Only engine results are cached. Results are stored without `case_id` and
+shared between hits, so callers must treat them as read-only.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int, max_entries: int = 0):
+        self.max_bytes = int(max_bytes)
+        self.max_entries = int(max_entries)
+        self.bytes = 0
+        self.generation: Optional[Hashable] = None
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key_for(inputs: Dict[str, Any], sequence: List[str]) -> str:
+        # sort_keys makes the key independent of input order; JSON keeps
+        # true/1/1.0 distinct, which matters for `is` checks in rules.
+        canonical = json.dumps([inputs, sequence], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def check_generation(self, generation: Hashable) -> None:
+        """
+        Drop every entry if the operator set or flows changed since the
+        last call.
+        """
+        if generation == self.generation:
+            return
+        with self._lock:
+            if generation == self.generation:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self.generation = generation
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, result: Dict[str, Any], generation: Hashable) -> None:
+        size = len(key) + len(json.dumps(result, separators=(",", ":")))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            # A reload may have happened while this result was computed.
+            if generation != self.generation:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (result, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+
+def cache_from_env() -> Optional[ResultCache]:
+    """
+    Cache sized by RESULT_CACHE_MB (disabled when unset or 0), optionally
+    capped at RESULT_CACHE_ENTRIES entries.
+    """
+    megabytes = float(os.environ.get("RESULT_CACHE_MB", "0"))
+    if megabytes <= 0:
+        return None
+    return ResultCache(int(megabytes * 1024 * 1024), int(os.environ.get("RESULT_CACHE_ENTRIES", "0")))
@@ -0,0 +1,134 @@
+"""
+Declarative routing table behind api.route_operators.
+
+routing.json lists the operators to score (in the order the scores are
+reported), the fallback operators, and rules of the form
+{"operator", "add" | "set", "when"}. A `when` is a clause
+{"key", "op", "value" | "other", ["default"], ["other_default"]} or
+{"any": [...]} / {"all": [...]} of clauses; keys are read with
+inputs.get(key, default), exactly like the hand-written checks were.
+
+At load every rule is compiled to a Python predicate and indexed by the
+input keys it reads. A request evaluates only rules that read at least one
+key present in `inputs`; a rule none of whose keys are present has a fixed
+outcome (its value on {}), computed once at load.
+"""
+import heapq
+import json
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Tuple
+
+
+CLAUSE_OPS = {
+    "is": "is",
+    "eq": "==",
+    "lt": "<",
+    "le": "<=",
+    "gt": ">",
+    "ge": ">=",
+    "in": "in",
+    "not_in": "not in"
+}
+
+
+def _lookup(key: str, default: Any) -> str:
+    if default is None:
+        return f"inputs.get({key!r})"
+    return f"inputs.get({key!r}, {default!r})"
+
+
+def _clause_source(clause: Dict[str, Any], keys: set) -> str:
+    for combinator, joiner in (("any", " or "), ("all", " and ")):
+        if combinator in clause:
+            parts = [_clause_source(sub, keys) for sub in clause[combinator]]
+            if not parts:
+                raise ValueError(f"empty '{combinator}' clause")
+            return "(" + joiner.join(parts) + ")"
+
+    key = clause["key"]
+    op = clause.get("op")
+    if op not in CLAUSE_OPS:
+        raise ValueError(f"unknown routing op: {op!r}")
+    keys.add(key)
+    left = _lookup(key, clause.get("default"))
+    if "other" in clause:
+        keys.add(clause["other"])
+        right = _lookup(clause["other"], clause.get("other_default"))
+    else:
+        value = clause.get("value")
+        if op in ("in", "not_in"):
+            if not isinstance(value, list):
+                raise ValueError(f"'{op}' needs a list value for {key}")
+            value = tuple(value)
+        elif op == "is" and not (value is True or value is False or value is None):
+            raise ValueError(f"'is' needs true, false or null for {key}")
+        right = repr(value)
+    return f"({left} {CLAUSE_OPS[op]} {right})"
+
+
+_by_score = itemgetter(1)
+
+
+class RoutingTable:
+    def __init__(self, table: Dict[str, Any]):
+        self.operators: List[str] = list(table.get("operators", []))
+        self._zero_scores = dict.fromkeys(self.operators, 0)
+        self.default: List[str] = list(table.get("default", []))
+        # (operator, points, is_set, predicate) in file order
+        self.rules: List[Tuple[str, int, bool, Callable[[dict], bool]]] = []
+        self.index: Dict[str, int] = {}
+        self.fixed_mask = 0
+
+        for position, rule in enumerate(table.get("rules", [])):
+            keys: set = set()
+            source = _clause_source(rule["when"], keys)
+            predicate = eval(compile(f"lambda inputs: {source}", f"<routing rule {position}>", "eval"), {})
+            is_set = "set" in rule
+            points = rule["set"] if is_set else rule.get("add", 0)
+            self.rules.append((rule["operator"], points, is_set, predicate))
+            bit = 1 << position
+            for key in keys:
+                self.index[key] = self.index.get(key, 0) | bit
+            if predicate({}):
+                self.fixed_mask |= bit
+
+    def score(self, inputs: Dict[str, Any]) -> Dict[str, int]:
+        indexed = 0
+        index = self.index
+        for key in inputs:
+            bits = index.get(key)
+            if bits:
+                indexed |= bits
+        pending = indexed | self.fixed_mask
+        scores = self._zero_scores.copy()
+        # Lowest bit first keeps file order, so the first rule to raise and
+        # the insertion order of "set" operators match a full scan.
+        while pending:
+            low = pending & -pending
+            pending ^= low
+            operator_id, points, is_set, predicate = self.rules[low.bit_length() - 1]
+            if low & indexed and not predicate(inputs):
+                continue
+            if is_set:
+                scores[operator_id] = points
+            else:
+                scores[operator_id] += points
+        return scores
+
+    def route(self, inputs: Dict[str, Any], top_n: int) -> Dict[str, Any]:
+        scores = self.score(inputs)
+        positive = [item for item in scores.items() if item[1] > 0]
+        # Both are stable, so ties keep score-dict order as before.
+        if len(positive) > top_n:
+            ranked = heapq.nlargest(top_n, positive, key=_by_score)
+        else:
+            ranked = sorted(positive, key=_by_score, reverse=True)
+        top = [op for op, score in ranked]
+        if not top:
+            top = list(self.default)
+        return {"operators": top, "scores": scores}
+
+
+def load_routing(path: str) -> RoutingTable:
+    with open(path, "r", encoding="utf-8") as f:
+        return RoutingTable(json.load(f))
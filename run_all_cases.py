@@ -1,7 +1,12 @@
+import argparse
 import json
+import multiprocessing
 import os
+import signal
 import sys
+import time
 
+import bundle
 import engine
 
 
@@ -23,43 +28,162 @@ def matches_expected(result: dict, expected: dict) -> bool:
     return True
 
 
-def main() -> int:
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    cases_dir = os.path.join(base_dir, "cases")
-    operators_dir = os.path.join(base_dir, "operators")
-
-    case_files = sorted(
-        fname for fname in os.listdir(cases_dir) if fname.endswith(".json")
-    )
-
-    total = 0
-    ok = 0
-    gated = 0
-    fail = 0
-
-    for fname in case_files:
-        total += 1
-        path = os.path.join(cases_dir, fname)
-        case = load_json(path)
-        expected = case.get("expected", {})
-
-        result = engine.run_case(path, operators_dir)
+class CaseTimeout(Exception):
+    pass
+
+
+_OPERATORS_DIR = ""
+_TIMEOUT = 0.0
+
+
+def _on_alarm(signum, frame):
+    raise CaseTimeout()
+
+
+def init_worker(operators_dir: str, timeout: float) -> None:
+    """
+    Per-process setup: load the operator set once (from operators.bundle
+    when it is fresh) and arm per-case timeouts.
+    """
+    global _OPERATORS_DIR, _TIMEOUT
+    _OPERATORS_DIR = operators_dir
+    _TIMEOUT = timeout if hasattr(signal, "setitimer") else 0.0
+    if _TIMEOUT:
+        signal.signal(signal.SIGALRM, _on_alarm)
+    registry = engine.get_registry(operators_dir)
+    if not registry.version:
+        bundle.load_into(registry)
+    registry.refresh(force=True)
+
+
+def check_case(path: str) -> dict:
+    record = {"case": os.path.basename(path), "path": path}
+    started = time.perf_counter()
+    try:
+        if _TIMEOUT:
+            signal.setitimer(signal.ITIMER_REAL, _TIMEOUT)
+        try:
+            case = load_json(path)
+            result = engine.run_case(path, _OPERATORS_DIR)
+        finally:
+            if _TIMEOUT:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except CaseTimeout:
+        record.update(outcome="TIMEOUT", error=f"exceeded {_TIMEOUT}s")
+    except Exception as exc:
+        record.update(outcome="ERROR", error=f"{type(exc).__name__}: {exc}")
+    else:
         status = result.get("status")
-
-        if not matches_expected(result, expected):
-            print(f"[FAIL] {fname}")
-            fail += 1
-            continue
-
-        if status == "GATED":
-            print(f"[GATED] {fname}")
-            gated += 1
+        record["status"] = status
+        if not matches_expected(result, case.get("expected", {})):
+            record["outcome"] = "FAIL"
+        elif status == "GATED":
+            record["outcome"] = "GATED"
         else:
-            print(f"[OK] {fname}")
-            ok += 1
-
-    print(f"Summary: total={total} ok={ok} gated={gated} fail={fail}")
-    return 1 if fail > 0 else 0
+            record["outcome"] = "OK"
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return record
+
+
+def discover(paths: list) -> list:
+    case_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            case_files.extend(
+                os.path.join(path, fname)
+                for fname in sorted(os.listdir(path))
+                if fname.endswith(".json")
+            )
+        else:
+            case_files.append(path)
+    return case_files
+
+
+def iter_records(case_files: list, operators_dir: str, workers: int, timeout: float, pool_holder: list):
+    """
+    Yield one record per case in input order. With workers > 1 cases run in
+    a process pool; each worker loads the operators once in `init_worker`.
+    """
+    if workers <= 1:
+        init_worker(operators_dir, timeout)
+        for path in case_files:
+            yield check_case(path)
+        return
+    pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(operators_dir, timeout))
+    pool_holder.append(pool)
+    chunksize = max(1, min(64, len(case_files) // (workers * 8)))
+    yield from pool.imap(check_case, case_files, chunksize)
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Run regression cases against the operator set.")
+    parser.add_argument("paths", nargs="*", default=[os.path.join(base_dir, "cases")],
+                        help="case files or directories of *.json cases (default: cases/)")
+    parser.add_argument("--operators-dir", default=os.path.join(base_dir, "operators"))
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; 0 means one per CPU (default: 1, in-process)")
+    parser.add_argument("--timeout", type=float, default=0.0,
+                        help="per-case timeout in seconds (default: none)")
+    parser.add_argument("--jsonl", action="store_true",
+                        help="stream one JSON object per case instead of text lines")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first FAIL, ERROR or TIMEOUT")
+    parser.add_argument("--summary-json", metavar="PATH",
+                        help="also write the summary as JSON to PATH ('-' for stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    case_files = discover(args.paths)
+
+    counts = {"total": 0, "ok": 0, "gated": 0, "fail": 0, "error": 0, "timeout": 0}
+    failures = []
+    started = time.perf_counter()
+    pool_holder: list = []
+    stopped_early = False
+    try:
+        for record in iter_records(case_files, args.operators_dir, workers, args.timeout, pool_holder):
+            outcome = record["outcome"]
+            counts["total"] += 1
+            counts[outcome.lower()] += 1
+            if args.jsonl:
+                print(json.dumps(record), flush=True)
+            else:
+                print(f"[{outcome}] {record['case']}", flush=True)
+            if outcome in ("FAIL", "ERROR", "TIMEOUT"):
+                failures.append(record["case"])
+                if args.fail_fast:
+                    stopped_early = True
+                    break
+    finally:
+        for pool in pool_holder:
+            pool.terminate()
+            pool.join()
+
+    failed = counts["fail"] + counts["error"] + counts["timeout"]
+    if not args.jsonl:
+        line = f"Summary: total={counts['total']} ok={counts['ok']} gated={counts['gated']} fail={failed}"
+        if counts["error"] or counts["timeout"]:
+            line += f" (error={counts['error']} timeout={counts['timeout']})"
+        print(line)
+    if args.summary_json:
+        summary = {
+            **counts,
+            "discovered": len(case_files),
+            "failures": failures,
+            "stopped_early": stopped_early,
+            "workers": workers,
+            "elapsed_s": round(time.perf_counter() - started, 3)
+        }
+        if args.summary_json == "-":
+            print(json.dumps(summary))
+        else:
+            with open(args.summary_json, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+    return 1 if failed > 0 else 0
 
 
 if __name__ == "__main__":
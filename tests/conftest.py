@@ -0,0 +1,71 @@
+import copy
+import glob
+import json
+import os
+import random
+import sys
+
+import pytest
+
+# The modules live flat at the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+OPERATORS_DIR = os.path.join(ROOT, "operators")
+CASES_PER_FLOW = int(os.environ.get("TEST_CASES_PER_FLOW", "25"))
+
+
+@pytest.fixture(scope="session")
+def operators_dir():
+    return OPERATORS_DIR
+
+
+@pytest.fixture(scope="session")
+def flows():
+    with open(os.path.join(ROOT, "flows.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def corpus(flows):
+    """
+    (case_id, inputs, sequence) for the fixture cases plus seeded
+    generated cases for every flow, so differential tests see both.
+    """
+    import gen_cases
+
+    found = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "cases", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            case = json.load(f)
+        found.append((case.get("case_id"), case.get("inputs", {}), case.get("operator_sequence", [])))
+    values = gen_cases.corpus_values(os.path.join(ROOT, "cases"))
+    for flow_id, sequence in sorted(flows.items()):
+        generator = gen_cases.FlowGenerator(flow_id, sequence, values)
+        for case in generator.generate(CASES_PER_FLOW, random.Random(f"tests:{flow_id}")):
+            found.append((case["case_id"], case["inputs"], case["operator_sequence"]))
+    return found
+
+
+# Values that exercise type mismatches, missing-name and fallback paths.
+ODD_VALUES = (True, False, None, 0, 1, 1.0, 2, -1, 0.5, "", "OTHER", "true", [], [1], {})
+
+
+@pytest.fixture(scope="session")
+def mutated_corpus(corpus):
+    """
+    The corpus with a few inputs per case replaced by odd values or
+    dropped, seeded so failures reproduce.
+    """
+    rng = random.Random("tests:mutated")
+    found = []
+    for case_id, inputs, sequence in corpus:
+        changed = copy.deepcopy(inputs)
+        keys = sorted(changed)
+        for key in rng.sample(keys, min(len(keys), rng.randint(1, 3))):
+            if rng.random() < 0.2:
+                del changed[key]
+            else:
+                changed[key] = rng.choice(ODD_VALUES)
+        found.append((f"{case_id}~", changed, sequence))
+    return found
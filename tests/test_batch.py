@@ -0,0 +1,42 @@
+import pytest
+
+import engine
+
+
+def _by_sequence(cases, operators_dir):
+    # run_batch stops at the first error, so only cases that run cleanly
+    groups = {}
+    for case_id, inputs, sequence in cases:
+        try:
+            expected = engine.run_inputs(case_id, inputs, sequence, operators_dir)
+        except Exception:
+            continue
+        groups.setdefault(tuple(sequence), []).append((case_id, inputs, expected))
+    return groups
+
+
+def test_batch_runs_match_single_runs(corpus, mutated_corpus, operators_dir):
+    groups = _by_sequence(corpus + mutated_corpus, operators_dir)
+    assert len(groups) > 5
+    for sequence, items in groups.items():
+        case_ids = [case_id for case_id, _, _ in items]
+        inputs_list = [inputs for _, inputs, _ in items]
+        expected = [result for _, _, result in items]
+        assert engine.run_batch(inputs_list, list(sequence), operators_dir, case_ids) == expected
+        lazy = engine.run_batch(iter(inputs_list), list(sequence), operators_dir, iter(case_ids), lazy=True)
+        assert list(lazy) == expected
+
+
+def test_batch_default_case_ids(corpus, operators_dir):
+    _, inputs, sequence = corpus[0]
+    results = engine.run_batch([inputs, inputs], sequence, operators_dir)
+    assert [result["case_id"] for result in results] == ["0", "1"]
+    assert results[1] == engine.run_inputs("1", inputs, sequence, operators_dir)
+
+
+def test_batch_rejects_mismatched_case_ids(corpus, operators_dir):
+    _, inputs, sequence = corpus[0]
+    with pytest.raises(ValueError):
+        engine.run_batch([inputs, inputs], sequence, operators_dir, ["a"])
+    with pytest.raises(ValueError):
+        list(engine.run_batch(iter([inputs]), sequence, operators_dir, iter(["a", "b"]), lazy=True))
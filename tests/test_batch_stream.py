@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+import api
+
+
+def _chunks(data: bytes, size: int):
+    return iter([data[i:i + size] for i in range(0, len(data), size)])
+
+
+DOCS = [
+    [],
+    [1, 2.5, -3e10, 1e-5, 0, 12345678901234567890],
+    ["é☃x", None, True, {"a": [1, {"b": "]"}]}, [[]]],
+    [{"inputs": {"k": "v" * 50}, "flow_id": "allocation"}] * 5,
+]
+
+
+@pytest.mark.parametrize("doc", DOCS)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_json_array_matches_json_loads_for_any_chunking(doc, size):
+    for text in (json.dumps(doc), json.dumps(doc, indent=2), json.dumps(doc, separators=(",", ":"))):
+        assert list(api.iter_json_array(_chunks(text.encode("utf-8"), size), 10 ** 6)) == doc
+
+
+@pytest.mark.parametrize("body", [b"", b"{}", b"[1,]", b"[1 2]", b"[1", b"[1]x", b"[,1]", b'["a]', b"[1.]", b"[tru]"])
+@pytest.mark.parametrize("size", [1, 3, 100])
+def test_json_array_rejects_malformed_bodies(body, size):
+    with pytest.raises(ValueError):
+        list(api.iter_json_array(_chunks(body, size), 10 ** 6))
+
+
+def test_json_array_bounds_each_item():
+    body = json.dumps(["small", "x" * 5000]).encode("utf-8")
+    items = api.iter_json_array(_chunks(body, 100), 1000)
+    assert next(items) == "small"
+    with pytest.raises(api.BodyError) as exc:
+        next(items)
+    assert exc.value.status == 413
+
+
+def test_ndjson_skips_blank_lines():
+    body = b'{"a": 1}\n\n[2]\r\n3'
+    assert list(api.iter_ndjson(_chunks(body, 2), 100)) == [{"a": 1}, [2], 3]
+    with pytest.raises(ValueError):
+        list(api.iter_ndjson(_chunks(b"{}\n{x}\n", 4), 100))
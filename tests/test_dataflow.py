@@ -0,0 +1,58 @@
+import copy
+
+import dataflow
+import engine
+
+
+def _full(case_id, inputs, sequence, operators_dir):
+    try:
+        return engine.run_inputs(case_id, inputs, sequence, operators_dir)
+    except Exception:
+        return None
+
+
+def _stops(result):
+    return [gate for gate in result["gates_triggered"] if gate["action"] in engine.STOP_ACTIONS]
+
+
+def test_planned_runs_match_full_runs(corpus, operators_dir):
+    checked = 0
+    for case_id, inputs, sequence in corpus:
+        full = _full(case_id, inputs, sequence, operators_dir)
+        if full is None:
+            continue
+        effects = dataflow.analyze_sequence(sequence, operators_dir)
+        keys = sorted({key for item in effects if item for key in item["writes"]})
+        for outputs in [[key] for key in keys] + [keys[:3]]:
+            planned = dataflow.run_planned(case_id, inputs, sequence, outputs, operators_dir)
+            expected = {key: full["state"][key] for key in outputs if key in full["state"]}
+            assert planned["state"] == expected, (case_id, outputs)
+            assert planned["status"] == full["status"], (case_id, outputs)
+            assert _stops(planned) == _stops(full), (case_id, outputs)
+            assert planned["partial"] is True
+            checked += 1
+    assert checked > 100
+
+
+def test_incremental_runs_match_full_runs(corpus, operators_dir):
+    checked = 0
+    for case_id, inputs, sequence in corpus:
+        previous = _full(case_id, inputs, sequence, operators_dir)
+        if previous is None:
+            continue
+        for key in sorted(inputs)[:4]:
+            changed = copy.deepcopy(inputs)
+            value = changed[key]
+            if isinstance(value, bool):
+                changed[key] = not value
+            elif isinstance(value, (int, float)):
+                changed[key] = value + 1
+            else:
+                changed.pop(key)
+            full = _full(case_id, changed, sequence, operators_dir)
+            if full is None:
+                continue
+            incremental = dataflow.run_incremental(case_id, changed, sequence, previous, [key], operators_dir)
+            assert incremental == full, (case_id, key)
+            checked += 1
+    assert checked > 50
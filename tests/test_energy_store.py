@@ -0,0 +1,67 @@
+import time
+
+import energy_store
+
+
+def _energy(potential, utilization=60, gap=20, ready_to_act=True):
+    return {"potential": potential, "utilization": utilization, "gap": gap, "ready_to_act": ready_to_act}
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = energy_store.MemoryEnergyStore(max_entries=2, ttl=0)
+    store.put("a", _energy(1))
+    store.put("b", _energy(2))
+    assert store.get("a")["potential"] == 1
+    store.put("c", _energy(3))
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_sqlite_store_round_trip_is_shared(tmp_path):
+    path = str(tmp_path / "energy.db")
+    writer = energy_store.SQLiteEnergyStore(path, ttl=0)
+    writer.put("case", _energy(70))
+    assert writer.get("case") == _energy(70)
+    writer.close()
+    reader = energy_store.SQLiteEnergyStore(path, ttl=0)
+    assert reader.get("case") == _energy(70)
+    assert len(reader) == 1
+    reader.close()
+
+
+def test_sqlite_store_flushes_out_of_range_integers(tmp_path):
+    store = energy_store.SQLiteEnergyStore(str(tmp_path / "energy.db"), ttl=0, flush_interval=0.01)
+    store.put("huge", _energy(10 ** 30))
+    store.put("beyond_float", _energy(-(10 ** 400)))
+    store.put("bad", _energy([1, 2]))
+    store.put("fine", _energy(50))
+    deadline = time.monotonic() + 5
+    while store.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stats = store.stats()
+    assert stats["pending"] == 0
+    assert stats["dropped"] == 1
+    assert store._flusher.is_alive()
+    store.close()
+
+    reopened = energy_store.SQLiteEnergyStore(store.path, ttl=0)
+    assert reopened.get("huge")["potential"] == 1e30
+    assert reopened.get("beyond_float")["potential"] == float("-inf")
+    assert reopened.get("bad") is None
+    assert reopened.get("fine")["potential"] == 50
+    reopened.close()
+
+
+def test_sqlite_store_restarts_a_dead_flusher(tmp_path):
+    store = energy_store.SQLiteEnergyStore(str(tmp_path / "energy.db"), ttl=0, flush_interval=0.01)
+    store.put("a", _energy(1))
+    dead = store._flusher
+    store._closed = True
+    store._wake.set()
+    dead.join()
+    store._closed = False
+    store.put("b", _energy(2))
+    assert store._flusher is not dead and store._flusher.is_alive()
+    store.close()
+    assert len(store) == 2
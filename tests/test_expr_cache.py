@@ -0,0 +1,31 @@
+import threading
+
+import pytest
+
+import engine
+
+
+def test_hits_are_counted_exactly_across_threads():
+    engine.clear_expr_cache()
+    engine.safe_eval("a + 1", {"a": 1})
+
+    def work():
+        for _ in range(5000):
+            engine.safe_eval("a + 1", {"a": 1})
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = engine.expr_cache_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 20000
+    assert stats["size"] == 1
+
+
+def test_invalid_expressions_raise_and_are_not_cached():
+    engine.clear_expr_cache()
+    with pytest.raises(ValueError):
+        engine.safe_eval("__import__('os')", {})
+    assert engine.expr_cache_stats()["size"] == 0
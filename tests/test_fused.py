@@ -0,0 +1,27 @@
+import engine
+import fused
+
+
+def _outcome(run, case_id, inputs, sequence, operators_dir):
+    try:
+        return run(case_id, inputs, sequence, operators_dir)
+    except Exception as exc:
+        return ("error", type(exc).__name__, str(exc))
+
+
+def test_fused_runs_match_engine(corpus, mutated_corpus, operators_dir):
+    for case_id, inputs, sequence in corpus + mutated_corpus:
+        expected = _outcome(engine.run_inputs, case_id, inputs, sequence, operators_dir)
+        assert _outcome(fused.run_fused, case_id, inputs, sequence, operators_dir) == expected, case_id
+
+
+def test_fused_handles_unknown_and_repeated_operators(corpus, operators_dir):
+    sequences = [
+        ["op.card01_state_standard", "op.does_not_exist", "op.card02_resulting_valence"],
+        ["op.allocation", "op.allocation"],
+        []
+    ]
+    for sequence in sequences:
+        for case_id, inputs, _ in corpus[:20]:
+            expected = _outcome(engine.run_inputs, case_id, inputs, sequence, operators_dir)
+            assert _outcome(fused.run_fused, case_id, inputs, sequence, operators_dir) == expected, (case_id, sequence)
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import api
+import engine
+import result_cache
+
+
+@pytest.fixture
+def cached_api(tmp_path, operators_dir, monkeypatch):
+    """
+    api.run_sequence with a result cache over a private copy of the
+    operators, rescanned on every call.
+    """
+    copied = str(tmp_path / "operators")
+    shutil.copytree(operators_dir, copied)
+    registry = engine.get_registry(copied)
+    registry.check_interval = 0
+    monkeypatch.setattr(api, "OPERATORS_DIR", copied)
+    monkeypatch.setattr(api, "REGISTRY", registry)
+    monkeypatch.setattr(api, "RESULT_CACHE", result_cache.ResultCache(16 * 1024 * 1024))
+    return copied
+
+
+def _outcome(run, *args):
+    try:
+        return run(*args)
+    except Exception as exc:
+        return ("error", type(exc).__name__, str(exc))
+
+
+def _check(cases, operators_dir):
+    for case_id, inputs, sequence in cases:
+        expected = _outcome(engine.run_inputs, case_id, inputs, sequence, operators_dir)
+        for use_fused in (False, True):
+            for run_id in (case_id, f"{case_id}#again"):
+                got = _outcome(api.run_sequence, run_id, inputs, sequence, use_fused)
+                if isinstance(expected, dict):
+                    assert got == {**expected, "case_id": run_id}, (case_id, use_fused)
+                else:
+                    assert got == expected, (case_id, use_fused)
+
+
+def test_cached_runs_match_engine_and_follow_operator_edits(cached_api, corpus, mutated_corpus, flows):
+    cases = [case for case in corpus + mutated_corpus if case[2] == flows["allocation"]]
+    assert cases
+    cache = api.RESULT_CACHE
+    _check(cases, cached_api)
+    assert cache.hits > 0
+    for case_id, inputs, sequence in cases:
+        if isinstance(_outcome(engine.run_inputs, case_id, inputs, sequence, cached_api), tuple):
+            # errors are never cached
+            assert cache._entries.get(cache.key_for(inputs, sequence)) is None, case_id
+
+    path = os.path.join(cached_api, "op_cash_pressure.json")
+    with open(path, encoding="utf-8") as f:
+        op = json.load(f)
+    for rule in op["rules"]:
+        rule["set"]["cash_pressure"] = "EDITED_" + rule["set"]["cash_pressure"]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(op, f)
+
+    _check(cases, cached_api)
+    assert cache.invalidations == 1
+    result = api.run_sequence("edited", cases[0][1], cases[0][2])
+    assert result["state"]["cash_pressure"].startswith("EDITED_")
@@ -0,0 +1,104 @@
+import json
+import operator
+import os
+import random
+
+import pytest
+
+import routing
+
+from conftest import ODD_VALUES, ROOT
+
+COMPARE = {
+    "is": operator.is_,
+    "eq": operator.eq,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "in": lambda left, right: left in right,
+    "not_in": lambda left, right: left not in right
+}
+
+
+def _holds(clause, inputs):
+    if "any" in clause:
+        return any(_holds(sub, inputs) for sub in clause["any"])
+    if "all" in clause:
+        return all(_holds(sub, inputs) for sub in clause["all"])
+    left = inputs.get(clause["key"], clause.get("default"))
+    if "other" in clause:
+        right = inputs.get(clause["other"], clause.get("other_default"))
+    else:
+        right = clause["value"]
+    return COMPARE[clause["op"]](left, right)
+
+
+def _scan(table, inputs, top_n):
+    # every rule in file order, as the hand-written router did
+    scores = dict.fromkeys(table["operators"], 0)
+    for rule in table["rules"]:
+        if _holds(rule["when"], inputs):
+            if "set" in rule:
+                scores[rule["operator"]] = rule["set"]
+            else:
+                scores[rule["operator"]] += rule.get("add", 0)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    top = [op for op, score in ranked if score > 0][:top_n]
+    return {"operators": top or list(table["default"]), "scores": scores}
+
+
+def _outcome(route, inputs, top_n):
+    try:
+        result = route(inputs, top_n)
+    except Exception as exc:
+        return ("error", type(exc).__name__)
+    # score order is part of the response
+    return result, list(result["scores"])
+
+
+@pytest.fixture(scope="module")
+def table():
+    with open(os.path.join(ROOT, "routing.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_indexed_routing_matches_full_scan(table, corpus, mutated_corpus):
+    router = routing.RoutingTable(table)
+    keys = sorted(router.index)
+    rng = random.Random("tests:routing")
+    inputs_list = [inputs for _, inputs, _ in corpus + mutated_corpus]
+    for _ in range(2000):
+        density = rng.choice((0.05, 0.3, 0.8))
+        inputs_list.append({key: rng.choice(ODD_VALUES) for key in keys if rng.random() < density})
+    for inputs in inputs_list:
+        top_n = rng.randint(1, 30)
+        expected = _outcome(lambda i, n: _scan(table, i, n), inputs, top_n)
+        assert _outcome(router.route, inputs, top_n) == expected, (inputs, top_n)
+
+
+@pytest.mark.parametrize("inputs, top_n, operators, scored", [
+    # outcomes of the hand-written router that routing.json replaced
+    ({}, 3, ["op.card01_state_standard"], {"op.card01_state_standard": 50}),
+    (
+        {"goal_defined": False, "motion_coherent": False, "standard_value": "x"}, 3,
+        ["op.velocity_definition"], {"op.velocity_definition": 20}
+    ),
+    (
+        {"commitment_action_defined": True, "commitment_timeframe_defined": True}, 30,
+        ["op.card01_state_standard", "op.conclusion_detection"],
+        {"op.card01_state_standard": 50, "op.conclusion_detection": 30}
+    ),
+    (
+        {"resulting_valence": 0, "effort": 2, "constraint_type": "X"}, 2,
+        ["op.card01_state_standard", "op.card02_resulting_valence"],
+        {
+            "op.card01_state_standard": 50, "op.card02_resulting_valence": 40,
+            "op.card07_laws_rules": 20, "op.card13_leverage": 30
+        }
+    )
+])
+def test_known_routes(table, inputs, top_n, operators, scored):
+    result = routing.RoutingTable(table).route(inputs, top_n)
+    assert result["operators"] == operators
+    assert {op: score for op, score in result["scores"].items() if score} == scored
@@ -0,0 +1,39 @@
+import itertools
+
+import engine
+
+from conftest import ODD_VALUES
+
+
+def _outcome(case_id, inputs, sequence, operators_dir):
+    try:
+        return engine.run_inputs(case_id, inputs, sequence, operators_dir)
+    except Exception as exc:
+        return ("error", type(exc).__name__, str(exc))
+
+
+def test_tabled_runs_match_evaluated_runs(corpus, mutated_corpus, operators_dir, monkeypatch):
+    engine.get_registry(operators_dir).refresh(force=True)
+    tables = dict(engine._TRUTH_TABLES)
+    assert tables
+    cases = corpus + mutated_corpus
+    tabled = [_outcome(case_id, inputs, sequence, operators_dir) for case_id, inputs, sequence in cases]
+    monkeypatch.setattr(engine, "_TRUTH_TABLES", {})
+    for (case_id, inputs, sequence), expected in zip(cases, tabled):
+        assert _outcome(case_id, inputs, sequence, operators_dir) == expected, case_id
+
+
+def test_table_lookup_matches_eval():
+    conditions = ["x == 1", "x == 'A' or x == null or x == 0.5", "not (y != True) and x != 'A'", "true"]
+    table = engine.truth_table(conditions, engine._all_true)
+    assert table is not None
+    codes = [engine.compile_expr(cond) for cond in conditions[:-1]]
+    for x, y in itertools.product(ODD_VALUES, ODD_VALUES):
+        env = {"x": x, "y": y}
+        results = [bool(eval(code, engine._EVAL_GLOBALS, env)) for code in codes] + [True]
+        assert table.lookup(env) == engine._all_true(results), env
+
+
+def test_non_finite_conditions_are_not_tabled():
+    assert engine.truth_table(["x > 1"], engine._first_true) is None
+    assert engine.truth_table(["x == y"], engine._first_true) is None
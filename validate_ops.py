@@ -1,7 +1,11 @@
+import argparse
 import json
 import os
 import sys
 
+import bundle
+import engine
+
 
 REQUIRED_KEYS = {"id", "name", "rules", "gates"}
 
@@ -30,17 +34,85 @@ def validate_operator(path: str) -> list:
     if not isinstance(gates, list):
         errors.append(f"{path}: gates must be a list")
 
+    errors.extend(validate_expressions(path, op))
+    return errors
+
+
+def validate_expressions(path: str, op: dict) -> list:
+    """
+    Parse every rule/gate expression against the engine's whitelist.
+    """
+    errors = []
+    for kind in ("rules", "gates"):
+        entries = op.get(kind)
+        if not isinstance(entries, list):
+            continue
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                errors.append(f"{path}: {kind}[{i}] must be an object")
+                continue
+            if not isinstance(entry.get("when", ""), str):
+                errors.append(f"{path}: {kind}[{i}].when must be a string")
+            set_expr = entry.get("set_expr", {})
+            if not isinstance(set_expr, dict):
+                errors.append(f"{path}: {kind}[{i}].set_expr must be an object")
+    if errors:
+        return errors
+
+    for expr in engine.operator_expressions(op):
+        try:
+            engine.parse_expr(expr)
+        except (SyntaxError, ValueError) as exc:
+            errors.append(f"{path}: invalid expression {expr!r} ({exc})")
+    return errors
+
+
+def validate_flows(path: str, op_ids: set) -> list:
+    if not os.path.exists(path):
+        return []
+    try:
+        flows = load_json(path)
+    except Exception as exc:
+        return [f"{path}: failed to load JSON ({exc})"]
+    if not isinstance(flows, dict):
+        return [f"{path}: must be an object"]
+
+    errors = []
+    for flow_id, sequence in flows.items():
+        if not isinstance(sequence, list) or not all(isinstance(op_id, str) for op_id in sequence):
+            errors.append(f"{path}: flow {flow_id} must be a list of operator ids")
+            continue
+        unknown = [op_id for op_id in sequence if op_id not in op_ids]
+        if unknown:
+            errors.append(f"{path}: flow {flow_id} names unknown operators {unknown}")
     return errors
 
 
-def main() -> int:
+def parse_args(argv: list) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Validate operators and flows.json.")
+    parser.add_argument("--bundle", nargs="?", const=bundle.DEFAULT_PATH, metavar="PATH",
+                        help="after validation, write the precompiled operator bundle (default operators.bundle)")
+    parser.add_argument("--check-bundle", nargs="?", const=bundle.DEFAULT_PATH, metavar="PATH",
+                        help="exit 1 if the bundle is missing or does not match the sources")
+    return parser.parse_args(argv)
+
+
+def main(argv: list = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
     base_dir = os.path.dirname(os.path.abspath(__file__))
     operators_dir = os.path.join(base_dir, "operators")
+    flows_path = os.path.join(base_dir, "flows.json")
 
     errors = []
+    op_ids = set()
     for fname in sorted(os.listdir(operators_dir)):
         if fname.endswith(".json"):
-            errors.extend(validate_operator(os.path.join(operators_dir, fname)))
+            path = os.path.join(operators_dir, fname)
+            file_errors = validate_operator(path)
+            errors.extend(file_errors)
+            if not file_errors:
+                op_ids.add(load_json(path)["id"])
+    errors.extend(validate_flows(flows_path, op_ids))
 
     if errors:
         print("Operator validation failed:")
@@ -49,6 +121,22 @@ def main() -> int:
         return 1
 
     print("All operators valid.")
+
+    if args.bundle:
+        built = bundle.build(operators_dir, flows_path)
+        bundle.write(built, args.bundle)
+        print(f"Wrote {args.bundle} ({bundle.describe(built)})")
+
+    if args.check_bundle:
+        try:
+            checked, _ = bundle.load(args.check_bundle, operators_dir, flows_path)
+        except FileNotFoundError:
+            print(f"Bundle {args.check_bundle} not found.")
+            return 1
+        except bundle.StaleBundle as exc:
+            print(f"Bundle {args.check_bundle} is stale: {exc}")
+            return 1
+        print(f"Bundle {args.check_bundle} is current ({bundle.describe(checked)})")
     return 0
 
 